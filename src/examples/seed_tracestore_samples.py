@@ -122,16 +122,17 @@ def seed_tracestore(backend: str = "postgres", db_url: str = None, samples_dir:
     print("💾 Ingesting traces into TraceStore...")
     print("-" * 70)
     
-    # Ingest traces
+    # Ingest traces, embedding them all in one batch first
     success_count = 0
     failed_count = 0
+    embeddings = store.embed_traces(traces)
     
-    for i, trace_data in enumerate(traces, 1):
+    for i, (trace_data, embedding) in enumerate(zip(traces, embeddings), 1):
         trace_id = trace_data.get("trace_id", "unknown")
         num_spans = len(trace_data.get("spans", []))
         
         try:
-            store.add_trace_from_dict(trace_data)
+            store.add_trace_from_dict(trace_data, embedding=embedding)
             print(f"✓ [{i}/{len(traces)}] Ingested trace {trace_id} ({num_spans} spans)")
             success_count += 1
         except Exception as e:
@@ -26,19 +26,26 @@ Features:
 - GET /api/v1/episodes/{episode_id}/traces: Retrieve all traces belonging to an episode
 - GET /api/v1/librarian_sessions/{session_id}: Retrieve librarian chat history
 - POST /api/v1/curriculum/generate: Generate curriculum tasks
+- POST /api/v1/curriculum/jobs: Start curriculum generation in the background
+- GET /api/v1/curriculum/jobs/{job_id}: Poll a background curriculum job
 - GET /api/v1/curriculum: List curriculum tasks
 - GET /api/v1/curriculum/export: Export curriculum tasks
 """
 
 from typing import List, Optional, Dict, Any
+from collections import OrderedDict
+from concurrent.futures import Future
 from datetime import datetime
+import asyncio
 import logging
-import uuid
+import secrets
+import threading
 import json
 
 from fastapi import APIRouter, HTTPException, Query, status, BackgroundTasks
 from fastapi.responses import Response
-from pydantic import BaseModel, Field, field_serializer, ConfigDict
+from starlette.concurrency import run_in_threadpool
+from pydantic import BaseModel, Field, field_serializer, ConfigDict, TypeAdapter
 
 from sqlalchemy import func, cast, Integer
 from sqlalchemy.dialects.postgresql import JSONB
@@ -63,6 +70,11 @@ store = TraceStore(
 # Initialize Librarian Agent (lazy loading)
 _librarian_agent = None
 
+# Background curriculum jobs keyed by job id (oldest finished jobs are pruned)
+_MAX_CURRICULUM_JOBS = 100
+_curriculum_jobs: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+_curriculum_jobs_lock = threading.Lock()
+
 
 def get_librarian_agent():
     """Lazy initialization of Librarian agent."""
@@ -85,6 +97,23 @@ def _build_ai_evaluation(result: Dict[str, Any]) -> Dict[str, Any]:
     }
 
 
+def _normalize_sources(sources: Any) -> Optional[List[str]]:
+    """Coerce librarian sources (ids, dicts with id/trace_id, or a scalar) to a list of ids."""
+    if sources is None:
+        return None
+    if not isinstance(sources, list):
+        return [str(sources)]
+    normalized: List[str] = []
+    for item in sources:
+        if isinstance(item, str):
+            normalized.append(item)
+        elif isinstance(item, dict):
+            value = item.get("id") or item.get("trace_id")
+            if value:
+                normalized.append(value if isinstance(value, str) else str(value))
+    return normalized
+
+
 def run_bg_evaluation(trace_id: str) -> None:
     try:
         judge_model_id = settings.LLM_MODEL or "gemini-1.5-flash"
@@ -394,21 +423,25 @@ class TraceInitIn(BaseModel):
     system_prompt: Optional[str] = Field(None, description="System prompt used by the agent")
 
 
-def _trace_to_out(trace) -> TraceOut:
-    span_outs = []
+def _trace_to_dict(trace) -> Dict[str, Any]:
+    system_prompt = trace.system_prompt
+    spans = []
     for span in trace.spans:
-        span_data = SpanOut.model_validate(span)
-        if trace.system_prompt:
-            span_data.attributes["system_prompt"] = trace.system_prompt
-        span_outs.append(span_data)
-
-    feedbacks = []
-    if trace.feedback:
-        feedbacks = [FeedbackOut(**trace.feedback)]
+        span_attributes = dict(span.attributes or {})
+        if system_prompt:
+            span_attributes["system_prompt"] = system_prompt
+        spans.append({
+            "span_id": span.span_id,
+            "parent_id": span.parent_id,
+            "name": span.name,
+            "start_time": span.start_time,
+            "end_time": span.end_time,
+            "attributes": span_attributes,
+        })
 
     trace_attributes: Dict[str, Any] = {}
-    if trace.system_prompt:
-        trace_attributes["system_prompt"] = trace.system_prompt
+    if system_prompt:
+        trace_attributes["system_prompt"] = system_prompt
     if trace.episode_id:
         trace_attributes["tracebrain.episode.id"] = trace.episode_id
     if trace.status:
@@ -423,13 +456,25 @@ def _trace_to_out(trace) -> TraceOut:
     if ai_eval:
         trace_attributes["tracebrain.ai_evaluation"] = ai_eval
 
-    return TraceOut(
-        trace_id=trace.id,
-        attributes=trace_attributes,
-        created_at=trace.created_at,
-        feedbacks=feedbacks,
-        spans=span_outs
-    )
+    return {
+        "trace_id": trace.id,
+        "attributes": trace_attributes,
+        "created_at": trace.created_at,
+        "feedbacks": [trace.feedback] if trace.feedback else [],
+        "spans": spans,
+    }
+
+
+_TRACE_LIST_ADAPTER = TypeAdapter(List[TraceOut])
+
+
+def _trace_to_out(trace) -> TraceOut:
+    return TraceOut.model_validate(_trace_to_dict(trace))
+
+
+def _traces_to_out(traces) -> List[TraceOut]:
+    """Validate a batch of ORM traces in a single pydantic pass."""
+    return _TRACE_LIST_ADAPTER.validate_python([_trace_to_dict(trace) for trace in traces])
 
 
 # ============================================================================
@@ -571,7 +616,7 @@ def list_traces(
             end_time=end_time,
         )
 
-        trace_outs = [_trace_to_out(trace) for trace in traces]
+        trace_outs = _traces_to_out(traces)
 
         return TraceListOut(
             total=total,
@@ -764,6 +809,7 @@ def add_feedback(trace_id: str, feedback: FeedbackIn):
                 trace.ai_evaluation = updated
                 trace.status = TraceStatus.completed
                 session.commit()
+                store.bump_write_generation()
         finally:
             session.close()
         
@@ -787,34 +833,52 @@ def add_feedback(trace_id: str, feedback: FeedbackIn):
 
 
 @router.post("/ops/batch_evaluate", tags=["Operations"])
-def batch_evaluate_traces(
+async def batch_evaluate_traces(
     limit: int = Query(5, ge=1, le=50, description="Max traces to evaluate per call"),
 ):
     """Evaluate recent traces without AI evaluations and attach scores."""
-    session = store.get_session()
     judge = AIJudge(store)
     processed = 0
     failed = 0
     errors: List[Dict[str, str]] = []
     try:
-        traces = (
-            session.query(Trace)
-            .filter(Trace.ai_evaluation.is_(None))
-            .order_by(Trace.created_at.desc())
-            .limit(limit)
-            .all()
+        # Only the ids are needed; release the connection before the LLM calls.
+        session = store.get_session()
+        try:
+            trace_ids = [
+                row[0]
+                for row in session.query(Trace.id)
+                .filter(Trace.ai_evaluation.is_(None))
+                .order_by(Trace.created_at.desc())
+                .limit(limit)
+                .all()
+            ]
+        finally:
+            session.close()
+
+        semaphore = asyncio.Semaphore(settings.BATCH_EVAL_CONCURRENCY)
+
+        async def _evaluate_one(trace_id: str) -> Dict[str, Any]:
+            async with semaphore:
+                return await run_in_threadpool(judge.evaluate, trace_id, settings.LLM_MODEL)
+
+        results = await asyncio.gather(
+            *(_evaluate_one(trace_id) for trace_id in trace_ids),
+            return_exceptions=True,
         )
 
-        for trace in traces:
+        evaluations: List[tuple[str, Dict[str, Any]]] = []
+        for trace_id, result in zip(trace_ids, results):
             try:
-                result = judge.evaluate(trace.id, settings.LLM_MODEL)
-                ai_eval = _build_ai_evaluation(result)
-                store.update_ai_evaluation(trace.id, ai_eval)
-                processed += 1
+                if isinstance(result, BaseException):
+                    raise result
+                evaluations.append((trace_id, _build_ai_evaluation(result)))
             except Exception as exc:
                 failed += 1
-                logger.exception("Batch evaluate failed for trace %s", trace.id)
-                errors.append({"trace_id": trace.id, "error": str(exc)})
+                logger.exception("Batch evaluate failed for trace %s", trace_id)
+                errors.append({"trace_id": trace_id, "error": str(exc)})
+
+        processed = await run_in_threadpool(store.bulk_update_ai_evaluations, evaluations)
 
         message = (
             "No traces pending evaluation."
@@ -830,8 +894,6 @@ def batch_evaluate_traces(
         }
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to batch evaluate traces: {str(e)}")
-    finally:
-        session.close()
 
 
 @router.delete("/ops/traces/cleanup", tags=["Operations"])
@@ -897,13 +959,7 @@ def generate_curriculum(request: GenerateCurriculumRequest):
     """Generate curriculum tasks from failed traces."""
     try:
         curator = CurriculumCurator(store)
-        provided_error_types = request.error_types or []
-        valid_error_types = [
-            value for value in provided_error_types if value in curator.VALID_ERROR_TYPES
-        ]
-        invalid_error_types = [
-            value for value in provided_error_types if value not in curator.VALID_ERROR_TYPES
-        ]
+        valid_error_types, invalid_error_types = _split_error_types(request.error_types)
         created = curator.generate_curriculum(
             error_types=valid_error_types or None,
             limit=request.limit,
@@ -921,6 +977,81 @@ def generate_curriculum(request: GenerateCurriculumRequest):
         raise HTTPException(status_code=500, detail=f"Failed to generate curriculum: {str(e)}")
 
 
+def _split_error_types(error_types: Optional[List[str]]):
+    provided = error_types or []
+    valid = [value for value in provided if value in CurriculumCurator.VALID_ERROR_TYPES]
+    invalid = [value for value in provided if value not in CurriculumCurator.VALID_ERROR_TYPES]
+    return valid, invalid
+
+
+def _register_curriculum_job(future: "Future[int]") -> str:
+    job_id = secrets.token_urlsafe(16)
+    with _curriculum_jobs_lock:
+        _curriculum_jobs[job_id] = {"future": future, "created_at": datetime.utcnow()}
+        if len(_curriculum_jobs) > _MAX_CURRICULUM_JOBS:
+            for stale_id in [
+                key for key, job in _curriculum_jobs.items() if job["future"].done()
+            ][: len(_curriculum_jobs) - _MAX_CURRICULUM_JOBS]:
+                del _curriculum_jobs[stale_id]
+    return job_id
+
+
+@router.post("/curriculum/jobs", status_code=status.HTTP_202_ACCEPTED, tags=["Curriculum"])
+def start_curriculum_job(request: GenerateCurriculumRequest):
+    """Start curriculum generation in the background and return a job id to poll."""
+    curator = CurriculumCurator(store)
+    if not curator.provider:
+        raise HTTPException(
+            status_code=400,
+            detail=f"LLM provider not configured for curriculum generation: {curator.provider_error}",
+        )
+    valid_error_types, invalid_error_types = _split_error_types(request.error_types)
+    try:
+        future = curator.generate_curriculum_async(
+            error_types=valid_error_types or None,
+            limit=request.limit,
+        )
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Failed to start curriculum job: {str(e)}")
+
+    job_id = _register_curriculum_job(future)
+    response: Dict[str, Any] = {"status": "pending", "job_id": job_id}
+    if invalid_error_types:
+        response["warning"] = {
+            "message": "Some error_types were not recognized and were ignored.",
+            "invalid_error_types": invalid_error_types,
+        }
+    return response
+
+
+@router.get("/curriculum/jobs/{job_id}", tags=["Curriculum"])
+def get_curriculum_job(job_id: str):
+    """Return the state of a background curriculum job."""
+    with _curriculum_jobs_lock:
+        job = _curriculum_jobs.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Curriculum job {job_id} not found")
+
+    future: "Future[int]" = job["future"]
+    response: Dict[str, Any] = {
+        "job_id": job_id,
+        "created_at": job["created_at"].isoformat(),
+    }
+    if not future.done():
+        response["status"] = "running" if future.running() else "pending"
+        return response
+
+    error = future.exception()
+    if error is not None:
+        response["status"] = "failed"
+        response["error"] = str(error)
+        return response
+
+    response["status"] = "success"
+    response["tasks_generated"] = future.result()
+    return response
+
+
 @router.get("/curriculum", response_model=List[CurriculumTaskOut], tags=["Curriculum"])
 def list_curriculum_tasks():
     """List all curriculum tasks ordered by creation time."""
@@ -993,7 +1124,7 @@ def list_episodes(
 
         episode_outs = []
         for episode_id, traces in episodes:
-            trace_outs = [_trace_to_out(trace) for trace in traces]
+            trace_outs = _traces_to_out(traces)
             episode_outs.append(EpisodeTracesOut(episode_id=episode_id, traces=trace_outs))
 
         return EpisodeListOut(total=total, skip=skip, limit=limit, episodes=episode_outs)
@@ -1085,7 +1216,7 @@ def get_episode_traces(episode_id: str):
         
         trace_ids = [trace.id for trace in traces_in_episode]
         traces = store.get_traces_by_ids(trace_ids, include_spans=True)
-        trace_outs = [_trace_to_out(trace) for trace in traces]
+        trace_outs = _traces_to_out(traces)
         return EpisodeTracesOut(episode_id=episode_id, traces=trace_outs)
 
     except HTTPException:
@@ -1172,7 +1303,7 @@ def natural_language_query(query: NaturalLanguageQuery):
     - Get tool usage statistics
     - Get database statistics
     """
-    session_id = query.session_id or str(uuid.uuid4())
+    session_id = query.session_id or secrets.token_urlsafe(16)
 
     if not LIBRARIAN_AVAILABLE:
         return NaturalLanguageResponse(
@@ -1189,27 +1320,11 @@ def natural_language_query(query: NaturalLanguageQuery):
         # Query the agent
         result = agent.query(query.query, session_id=session_id)
         
-        sources = result.get("sources")
-        normalized_sources: Optional[List[str]] = None
-        if sources is None:
-            normalized_sources = None
-        elif isinstance(sources, list):
-            normalized_sources = []
-            for item in sources:
-                if isinstance(item, str):
-                    normalized_sources.append(item)
-                elif isinstance(item, dict):
-                    value = item.get("id") or item.get("trace_id")
-                    if value:
-                        normalized_sources.append(str(value))
-        else:
-            normalized_sources = [str(sources)]
-
         return NaturalLanguageResponse(
             answer=result.get("answer", ""),
             session_id=session_id,
             suggestions=result.get("suggestions", []),
-            sources=normalized_sources,
+            sources=_normalize_sources(result.get("sources")),
         )
         
     except Exception as e:
@@ -4,16 +4,29 @@ TraceBrain TraceStore REST API History Router (v1)
 This router manages already viewed traces and episodes.
 
 Features:
-- GET /history: Retrieve paginated history of traces and episodes
+- GET /history: Retrieve paginated history of traces and episodes (offset or cursor)
 - POST /history: Add or update a trace or episode in history
+- POST /history/batch: Add or update several history entries at once
 - DELETE /history: Clear all traces and episodes history
 """
+from datetime import datetime
 from typing import Dict, List, Optional, Union
-from fastapi import APIRouter, HTTPException, Query
+import base64
+import hashlib
+import logging
+import uuid
+
+import orjson
+from fastapi import APIRouter, HTTPException, Query, Request, Response
 from pydantic import BaseModel, Field
 
 from fastapi import status
-from ..endpoints import TraceOut, _trace_to_out, store
+from starlette.concurrency import run_in_threadpool
+from ..endpoints import TraceOut, _traces_to_out, store
+
+logger = logging.getLogger(__name__)
+
+_PROCESS_TAG = uuid.uuid4().hex
 
 router = APIRouter(
     prefix="/history",
@@ -28,6 +41,10 @@ class HistoryListOut(BaseModel):
     total: int = Field(..., description="Total number of history entries")
     limit: int = Field(..., description="Number of items requested")
     offset: int = Field(..., description="Number of items skipped")
+    next_cursor: Optional[str] = Field(
+        None,
+        description="Cursor for the next page (pass as ?cursor=); null on the last page",
+    )
 
 
 class HistoryAddRequest(BaseModel):
@@ -40,75 +57,164 @@ class HistoryResponse(BaseModel):
     message: str = Field(..., description="Status message")
     deleted_count: Optional[int] = Field(None, description="Number of entries deleted")
 
+
+def _encode_cursor(key: Optional[tuple[datetime, str]]) -> Optional[str]:
+    if key is None:
+        return None
+    accessed, entry_id = key
+    payload = orjson.dumps([accessed.isoformat(), entry_id])
+    return base64.urlsafe_b64encode(payload).decode("ascii")
+
+
+def _decode_cursor(cursor: str) -> tuple[datetime, str]:
+    try:
+        accessed, entry_id = orjson.loads(base64.urlsafe_b64decode(cursor.encode("ascii")))
+        return datetime.fromisoformat(accessed), str(entry_id)
+    except Exception:
+        raise HTTPException(status_code=400, detail="Invalid history cursor")
+
+
+def _load_history_page(
+    limit: int,
+    offset: int,
+    type: str,
+    query: Optional[str],
+    cursor: Optional[str] = None,
+) -> HistoryListOut:
+    cursor_key = _decode_cursor(cursor) if cursor else None
+    if cursor_key is not None:
+        offset = 0
+
+    if type == "trace":
+        traces, total, next_key = store.get_history_traces(
+            limit=limit, offset=offset, query=query, cursor=cursor_key
+        )
+        
+        return HistoryListOut(
+            type="trace",
+            data=_traces_to_out(traces),
+            has_more=next_key is not None,
+            total=total,
+            limit=limit,
+            offset=offset,
+            next_cursor=_encode_cursor(next_key),
+        )
+    
+    elif type == "episode":
+        episodes, total, next_key = store.get_episode_history_hydrated(
+            limit=limit, offset=offset, query=query, cursor=cursor_key
+        )
+        result = {episode_id: _traces_to_out(traces) for episode_id, traces in episodes}
+        
+        return HistoryListOut(
+            type="episode",
+            data=result,
+            has_more=next_key is not None,
+            total=total,
+            limit=limit,
+            offset=offset,
+            next_cursor=_encode_cursor(next_key),
+        )
+    
+    else:
+        raise HTTPException(status_code=400, detail="type parameter must be 'trace' or 'episode'")
+
+
+def _history_etag(
+    type: str,
+    limit: int,
+    offset: int,
+    query: Optional[str],
+    cursor: Optional[str],
+    latest: Optional[datetime],
+    total: int,
+) -> str:
+    # The write generation is per process, so the process tag keeps one worker
+    # from confirming a tag issued by another.
+    payload = orjson.dumps(
+        [
+            _PROCESS_TAG,
+            store.write_generation,
+            type,
+            limit,
+            offset,
+            query,
+            cursor,
+            latest.isoformat() if latest else None,
+            total,
+        ]
+    )
+    return f'"{hashlib.blake2b(payload, digest_size=16).hexdigest()}"'
+
+
 # API Endpoints
 @router.get("", response_model=HistoryListOut, tags=["History"])
-def get_history(
+async def get_history(
+    request: Request,
     limit: int = Query(10, ge=1, le=100, description="Number of entries to return"),
-    offset: int = Query(0, ge=0, description="Number of entries to skip"),
+    offset: int = Query(
+        0,
+        ge=0,
+        description="Number of entries to skip (deprecated: prefer cursor)",
+    ),
     type: str = Query(..., description="Filter by type 'trace' or 'episode'"),
     query: Optional[str] = Query(None, description="Filter by ID"),
+    cursor: Optional[str] = Query(
+        None,
+        description="Opaque next_cursor from a previous page; takes precedence over offset",
+    ),
 ):
     """Get paginated history of traces and episodes with full trace data."""
     try:
-        items, total = store.get_history(limit=limit, offset=offset, type_filter=type, query=query)
-        
-        has_more = (offset + limit) < total
-        
-        if type == "trace":
-            trace_ids = [item.id for item in items] 
-            traces = []
-            for trace_id in trace_ids:
-                trace = store.get_trace(trace_id)
-                if trace:
-                    traces.append(_trace_to_out(trace))
-            
-            return HistoryListOut(
-                type="trace",
-                data=traces,
-                has_more=has_more,
-                total=total,
-                limit=limit,
-                offset=offset
-            )
-        
-        elif type == "episode":
-            result = {}
-            episode_ids = [item.id for item in items]
-            for episode_id in episode_ids:
-                traces = store.get_traces_by_episode_id(episode_id)
-                result[episode_id] = [_trace_to_out(trace) for trace in traces]
-            
-            return HistoryListOut(
-                type="episode",
-                data=result,
-                has_more=has_more,
-                total=total,
-                limit=limit,
-                offset=offset
-            )
-        
-        else:
+        if cursor:
+            offset = 0
+        if type not in ("trace", "episode"):
             raise HTTPException(status_code=400, detail="type parameter must be 'trace' or 'episode'")
-            
+
+        # The history version covers list membership and order; the store write
+        # generation covers feedback, evaluation and span changes to listed traces.
+        latest, total = await run_in_threadpool(store.get_history_version, type)
+        etag = _history_etag(type, limit, offset, query, cursor, latest, total)
+        if request.headers.get("if-none-match") == etag:
+            return Response(status_code=304, headers={"ETag": etag})
+
+        page = await run_in_threadpool(_load_history_page, limit, offset, type, query, cursor)
+        body = page.model_dump_json()
+        return Response(content=body, media_type="application/json", headers={"ETag": etag})
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to retrieve history: {str(e)}")
 
 
 @router.post("", response_model=HistoryResponse, status_code=status.HTTP_201_CREATED, tags=["History"])
-def add_history(request: HistoryAddRequest):
+async def add_history(request: HistoryAddRequest):
     """Record access to a trace or episode."""
     try:
-        store.add_history(id=request.id, type=request.type)
-        return HistoryResponse(success=True, message="History entry addeded successfully")
+        await run_in_threadpool(store.add_history, id=request.id, type=request.type)
+        return HistoryResponse(success=True, message="History entry added successfully")
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to add history entry: {str(e)}")
 
 
+@router.post("/batch", response_model=HistoryResponse, tags=["History"])
+async def add_history_batch(requests: List[HistoryAddRequest]):
+    """Record access to several traces or episodes with a single upsert."""
+    try:
+        written = await run_in_threadpool(
+            store.add_history_batch,
+            [(item.id, item.type) for item in requests],
+        )
+        return HistoryResponse(success=True, message=f"{written} history entries recorded")
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Failed to add history entries: {str(e)}")
+
+
 @router.delete("", response_model=HistoryResponse, tags=["History"])
-def clear_history():
+async def clear_history():
     """Clear all history entries."""
     try:
-        deleted_count = store.clear_history()
+        deleted_count = await run_in_threadpool(store.clear_history)
         return HistoryResponse(
             success=True,
             message="History cleared successfully",
@@ -7,8 +7,12 @@ Features:
 - GET /api/v1/settings: Retrieve current settings
 - POST /api/v1/settings: Update and persist settings
 """
-from typing import Any, Dict
-from fastapi import APIRouter, HTTPException
+from datetime import datetime
+from typing import Any, Dict, Optional
+import hashlib
+
+from fastapi import APIRouter, HTTPException, Request, Response
+from starlette.concurrency import run_in_threadpool
 
 from ..endpoints import store
 
@@ -17,12 +21,25 @@ router = APIRouter(
     tags=["Settings"],
 )
 
+
+def _settings_etag(version: Optional[datetime]) -> str:
+    # The store bumps updated_at on every write, so it versions the settings row
+    # consistently across workers.
+    stamp = version.isoformat() if version is not None else "unset"
+    return f'"{hashlib.blake2b(stamp.encode(), digest_size=16).hexdigest()}"'
+
+
 # API Endpoints
 @router.get("")
-async def get_settings() -> Dict[str, Any]:
+async def get_settings(request: Request, response: Response) -> Dict[str, Any]:
     """Load settings from the database."""
     try:
-        return store.get_settings()
+        version, config = await run_in_threadpool(store.get_versioned_settings)
+        etag = _settings_etag(version)
+        if request.headers.get("if-none-match") == etag:
+            return Response(status_code=304, headers={"ETag": etag})
+        response.headers["ETag"] = etag
+        return config
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -30,6 +47,6 @@ async def get_settings() -> Dict[str, Any]:
 async def save_settings(settings: Dict[str, Any]) -> Dict[str, Any]:
     """Save the settings object to the database."""
     try:
-        return store.update_settings(settings)
+        return await run_in_threadpool(store.update_settings, settings)
     except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
\ No newline at end of file
+        raise HTTPException(status_code=500, detail=str(e))
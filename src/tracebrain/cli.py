@@ -25,15 +25,16 @@ Usage:
     tracebrain-trace info            # Show current configuration
 """
 
+import functools
+import os
+import re
+import shutil
 import sys
 import subprocess
 import time
 from pathlib import Path
-from typing import Optional
+from typing import Any, Dict, List, Optional
 import typer
-import uvicorn
-
-from .config import settings
 
 # Create Typer app
 app = typer.Typer(
@@ -57,8 +58,14 @@ def find_docker_compose_file() -> Optional[Path]:
     Returns:
         Optional[Path]: Path to docker-compose.yml if found, None otherwise
     """
+    return _find_docker_compose_file(str(Path.cwd()))
+
+
+@functools.lru_cache(maxsize=4)
+def _find_docker_compose_file(cwd: str) -> Optional[Path]:
     # Start from the current file location (cli.py)
     current_file = Path(__file__).resolve()
+    working_dir = Path(cwd)
     
     # Try multiple locations (in order of preference)
     search_paths = [
@@ -66,7 +73,7 @@ def find_docker_compose_file() -> Optional[Path]:
         current_file.parent.parent.parent / "docker" / "docker-compose.yml",
         
         # 2. Current working directory docker/
-        Path.cwd() / "docker" / "docker-compose.yml",
+        working_dir / "docker" / "docker-compose.yml",
         
         # 3. Legacy: same directory as cli.py (backward compatibility)
         current_file.parent / "docker-compose.yml",
@@ -75,65 +82,170 @@ def find_docker_compose_file() -> Optional[Path]:
         current_file.parent.parent.parent / "docker-compose.yml",
         
         # 5. Fallback: current directory
-        Path.cwd() / "docker-compose.yml",
+        working_dir / "docker-compose.yml",
     ]
     
     for path in search_paths:
-        if path.exists() and path.is_file():
+        if path.is_file():
             return path
     
     return None
 
 
+@functools.lru_cache(maxsize=1)
 def check_docker_installed() -> bool:
     """
     Check if Docker is installed and accessible.
     
+    Only the PATH is scanned; a broken daemon still surfaces through the
+    subsequent docker compose invocation.
+    
     Returns:
         bool: True if docker command is available, False otherwise
     """
+    return shutil.which("docker") is not None
+
+
+def _parse_compose_ps_json(output: bytes) -> List[Dict[str, Any]]:
+    """
+    Parse ``docker compose ps --format json`` output.
+    
+    Compose v2.21+ emits one JSON object per line; older releases emit a
+    single JSON array.
+    
+    Raises:
+        ValueError: If the output is not JSON
+    """
+    import orjson
+
+    stripped = output.strip()
+    if not stripped:
+        return []
     try:
-        result = subprocess.run(
-            ["docker", "--version"],
-            capture_output=True,
-            text=True,
-            timeout=5
-        )
-        return result.returncode == 0
-    except (subprocess.SubprocessError, FileNotFoundError):
-        return False
+        if stripped.startswith(b"["):
+            return list(orjson.loads(stripped))
+        return [orjson.loads(line) for line in stripped.splitlines() if line.strip()]
+    except orjson.JSONDecodeError as e:
+        raise ValueError(str(e)) from e
+
+
+def _compose_project_name(compose_file: Path) -> str:
+    """
+    Return the compose project name docker compose derives for compose_file.
+    
+    Mirrors compose: COMPOSE_PROJECT_NAME if set, otherwise the compose file's
+    directory name, lowercased and stripped of characters compose disallows.
+    """
+    name = os.environ.get("COMPOSE_PROJECT_NAME") or compose_file.resolve().parent.name
+    return re.sub(r"[^a-z0-9_-]", "", name.lower()).lstrip("_-")
+
+
+def _list_containers_via_sdk(project: str) -> Optional[List[tuple]]:
+    """
+    List the containers of a compose project through the Docker SDK.
+    
+    Args:
+        project: Compose project name to match exactly
+    
+    Returns:
+        Optional[List[tuple]]: Rows of (name, service, state, status, ports),
+        or None if the SDK is not installed or the daemon is unreachable
+    """
+    try:
+        import docker
+        from docker.errors import DockerException
+    except ImportError:
+        return None
+
+    try:
+        client = docker.from_env()
+        try:
+            containers = client.containers.list(
+                all=True,
+                filters={"label": f"com.docker.compose.project={project}"},
+            )
+            rows = []
+            for container in containers:
+                health = (container.attrs.get("State") or {}).get("Health") or {}
+                status_text = container.status
+                if health.get("Status"):
+                    status_text = f"{status_text} ({health['Status']})"
+                ports = ", ".join(
+                    f"{binding['HostIp']}:{binding['HostPort']}->{container_port}"
+                    for container_port, bindings in (container.ports or {}).items()
+                    for binding in (bindings or [])
+                )
+                rows.append(
+                    (
+                        container.name,
+                        container.labels.get("com.docker.compose.service", ""),
+                        container.status,
+                        status_text,
+                        ports,
+                    )
+                )
+            return sorted(rows)
+        finally:
+            client.close()
+    except DockerException:
+        return None
+
+
+def _print_container_table(rows: List[tuple]) -> None:
+    """Render container rows (name, service, state, status, ports) as an aligned table."""
+    if not rows:
+        typer.echo("No containers found")
+        return
+
+    headers = ("NAME", "SERVICE", "STATE", "STATUS", "PORTS")
+    widths = [
+        max(len(str(value)) for value in column)
+        for column in zip(headers, *rows)
+    ]
+    for row in (headers, *rows):
+        typer.echo("  ".join(str(value).ljust(width) for value, width in zip(row, widths)).rstrip())
 
 
 def wait_for_health_check(
     base_url: str = "http://localhost:8000",
     timeout: int = 60,
-    interval: int = 2
+    interval: float = 2.0,
+    initial_delay: float = 0.1,
 ) -> bool:
     """
     Wait for the TraceStore API to become healthy.
     
+    Probes back off exponentially from ``initial_delay`` up to ``interval``
+    so a fast start is detected quickly without hammering a slow one.
+    
     Args:
         base_url: Base URL of the API
         timeout: Maximum time to wait in seconds
-        interval: Time between checks in seconds
+        interval: Maximum time between checks in seconds
+        initial_delay: Delay after the first failed check in seconds
     
     Returns:
         bool: True if API became healthy, False if timeout
     """
     from .sdk.client import TraceClient
     
-    client = TraceClient(base_url=base_url)
-    start_time = time.time()
+    start_time = time.monotonic()
+    delay = initial_delay
     
     typer.echo(f"Waiting for TraceStore to become ready at {base_url}...")
     
-    while time.time() - start_time < timeout:
-        if client.health_check():
-            typer.echo("TraceStore is ready")
-            return True
-        
-        time.sleep(interval)
-        typer.echo(".", nl=False)  # Progress indicator
+    # One client for every probe so the keep-alive connection is reused once
+    # the server accepts it. The loop owns the retry schedule, so the client's
+    # own retries are disabled.
+    with TraceClient(base_url=base_url, max_retries=0) as client:
+        while time.monotonic() - start_time < timeout:
+            if client.health_check():
+                typer.echo("TraceStore is ready")
+                return True
+            
+            time.sleep(delay)
+            delay = min(delay * 2, interval)
+            typer.echo(".", nl=False)  # Progress indicator
     
     typer.echo("\nTimeout waiting for TraceStore to become ready")
     return False
@@ -217,11 +329,7 @@ def up(
     
     # Execute docker compose up
     try:
-        result = subprocess.run(
-            cmd,
-            check=True,
-            text=True
-        )
+        result = subprocess.run(cmd, check=True)
         
         if result.returncode == 0:
             typer.echo("")
@@ -310,11 +418,7 @@ def down(
     
     # Execute docker compose down
     try:
-        result = subprocess.run(
-            cmd,
-            check=True,
-            text=True
-        )
+        result = subprocess.run(cmd, check=True)
         
         if result.returncode == 0:
             typer.echo("")
@@ -358,18 +462,44 @@ def status():
         typer.echo("Error: docker-compose.yml not found", err=True)
         sys.exit(1)
     
+    # Prefer querying the daemon directly; fall back to the compose CLI
+    rows = _list_containers_via_sdk(_compose_project_name(compose_file))
+    if rows is not None:
+        _print_container_table(rows)
+        typer.echo("")
+        return
+
     # Build docker compose command
-    cmd = ["docker", "compose", "-f", str(compose_file), "ps"]
+    cmd = ["docker", "compose", "-f", str(compose_file), "ps", "--all", "--format", "json"]
     
     # Execute docker compose ps
     try:
-        subprocess.run(cmd, check=True)
-        typer.echo("")
-        
+        result = subprocess.run(cmd, check=True, capture_output=True)
     except subprocess.CalledProcessError as e:
         typer.echo(f"\nError checking status: {e}", err=True)
         sys.exit(1)
 
+    try:
+        containers = _parse_compose_ps_json(result.stdout)
+    except ValueError:
+        # Unknown output format; show docker's own rendering instead
+        typer.echo(result.stdout.decode(errors="replace"))
+        return
+
+    _print_container_table(
+        [
+            (
+                item.get("Name", ""),
+                item.get("Service", ""),
+                item.get("State", ""),
+                item.get("Status", ""),
+                item.get("Ports", ""),
+            )
+            for item in containers
+        ]
+    )
+    typer.echo("")
+
 
 # ============================================================================
 # Development Server Commands
@@ -399,6 +529,13 @@ def start(
         None,
         "--log-level",
         help="Logging level (debug, info, warning, error, critical)"
+    ),
+    workers: Optional[int] = typer.Option(
+        None,
+        "--workers",
+        "-w",
+        min=1,
+        help="Number of worker processes (overrides config; ignored with --reload)"
     )
 ):
     """
@@ -411,11 +548,19 @@ def start(
         tracebrain-trace start
         tracebrain-trace start --host 0.0.0.0 --port 8080
         tracebrain-trace start --reload --log-level debug
+        tracebrain-trace start --workers 4
+    
+    Each worker process opens its own database pool of up to
+    DB_POOL_SIZE + DB_MAX_OVERFLOW connections.
     """
+    import uvicorn
+    from .config import settings
+
     # Use provided values or fall back to settings
     server_host = host or settings.HOST
     server_port = port or settings.PORT
     server_log_level = (log_level or settings.LOG_LEVEL).lower()
+    server_workers = 1 if reload else (workers or settings.WORKERS)
     
     typer.echo("=" * 70)
     typer.echo("TraceBrain Tracing - Starting API Server")
@@ -426,6 +571,7 @@ def start(
     typer.echo(f"Backend Type:   {settings.get_backend_type()}")
     typer.echo(f"Log Level:      {server_log_level}")
     typer.echo(f"Reload:         {reload}")
+    typer.echo(f"Workers:        {server_workers}")
     typer.echo("")
     typer.echo(f"-> API Docs:     http://{server_host}:{server_port}/docs")
     typer.echo(f"-> Frontend:     http://{server_host}:{server_port}/")
@@ -438,6 +584,7 @@ def start(
             host=server_host,
             port=server_port,
             reload=reload,
+            workers=server_workers,
             log_level=server_log_level
         )
     except KeyboardInterrupt:
@@ -466,6 +613,7 @@ def init_db(
         tracebrain-trace init-db
         tracebrain-trace init-db --drop  # WARNING: Deletes all data!
     """
+    from .config import settings
     from .db.session import create_tables, drop_tables
     
     typer.echo("=" * 70)
@@ -507,6 +655,7 @@ def generate_curriculum():
     Example:
         tracebrain-trace generate-curriculum
     """
+    from .config import settings
     from .core.curator import CurriculumCurator
     from .core.store import TraceStore
 
@@ -543,7 +692,7 @@ def info():
         tracebrain-trace info
     """
     import platform
-    from pathlib import Path
+    from .config import settings
     
     typer.echo("=" * 70)
     typer.echo("TraceBrain Tracing - System Information")
@@ -558,6 +707,16 @@ def info():
     typer.echo(f"  Log Level:        {settings.LOG_LEVEL}")
     typer.echo(f"  Static Dir:       {settings.STATIC_DIR}")
     typer.echo("")
+
+    typer.echo("[Database Pool]")
+    if settings.is_sqlite:
+        typer.echo("  Pool:             SQLite (pool sizing not applied)")
+    else:
+        typer.echo(f"  Pool Size:        {settings.DB_POOL_SIZE}")
+        typer.echo(f"  Max Overflow:     {settings.DB_MAX_OVERFLOW}")
+        typer.echo(f"  Pool Timeout:     {settings.DB_POOL_TIMEOUT}s")
+    typer.echo(f"  Pool Recycle:     {settings.DB_POOL_RECYCLE}s")
+    typer.echo("")
     
     typer.echo("[Features]")
     typer.echo(f"  LLM Provider:     {settings.LLM_PROVIDER}")
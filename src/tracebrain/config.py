@@ -22,6 +22,7 @@ class Settings(BaseSettings):
     
     Configuration is loaded from environment variables with fallback to defaults.
     The .env file is automatically loaded if present in the working directory.
+    The instance is frozen so it can be shared across threads without copies.
     
     Attributes:
         DATABASE_URL: SQLAlchemy database connection string.
@@ -38,7 +39,8 @@ class Settings(BaseSettings):
         env_file=".env",
         env_file_encoding="utf-8",
         case_sensitive=True,
-        extra="ignore"
+        extra="ignore",
+        frozen=True,
     )
     
     # Database Configuration
@@ -65,9 +67,21 @@ class Settings(BaseSettings):
         description="Logging level (debug, info, warning, error, critical)"
     )
 
+    WORKERS: int = Field(
+        default=1,
+        ge=1,
+        description="Number of uvicorn worker processes for 'tracebrain-trace start'"
+    )
+
+    THREADPOOL_MAX_WORKERS: int = Field(
+        default=40,
+        ge=1,
+        description="Worker threads available for blocking database calls from async endpoints"
+    )
+
     # Database Pool Configuration
     DB_POOL_SIZE: int = Field(
-        default=5,
+        default=20,
         ge=1,
         description="Base number of database connections in the pool"
     )
@@ -81,16 +95,53 @@ class Settings(BaseSettings):
         ge=60,
         description="Recycle DB connections after N seconds"
     )
+    DB_POOL_TIMEOUT: int = Field(
+        default=30,
+        ge=1,
+        description="Seconds to wait for a pooled connection before giving up"
+    )
+
+    # History Write-Behind Configuration
+    HISTORY_WRITE_BEHIND: bool = Field(
+        default=False,
+        description=(
+            "Queue single history views in process memory and flush them in batches; "
+            "queued entries are lost on crash and invisible to other workers until flushed"
+        )
+    )
+    HISTORY_BUFFER_SIZE: int = Field(
+        default=10000,
+        ge=1,
+        description="Maximum number of queued history entries awaiting flush"
+    )
+    HISTORY_FLUSH_BATCH_SIZE: int = Field(
+        default=500,
+        ge=1,
+        description="Maximum number of history entries written per flush transaction"
+    )
+    HISTORY_FLUSH_INTERVAL_MS: int = Field(
+        default=500,
+        ge=10,
+        description="Interval between background history flushes (milliseconds)"
+    )
     
     # Embedding Configuration
     EMBEDDING_PROVIDER: str = Field(
         default="local",
-        description="Embedding provider (local, openai, gemini, none)"
+        description="Embedding provider (local, onnx, openai, gemini, none)"
     )
     EMBEDDING_MODEL: str = Field(
         default="all-MiniLM-L6-v2",
         description="Embedding model name for local provider"
     )
+    EMBEDDING_DEVICE: Optional[str] = Field(
+        default=None,
+        description="Torch device for the local embedding model (e.g. cpu, cuda); auto-detected when unset"
+    )
+    EMBEDDING_CACHE_DIR: Optional[str] = Field(
+        default=None,
+        description="Directory for a persistent query-embedding cache (requires diskcache)"
+    )
     EMBEDDING_API_KEY: Optional[str] = Field(
         default=None,
         description="API key for embedding provider (if required)"
@@ -99,6 +150,12 @@ class Settings(BaseSettings):
         default=None,
         description="Base URL for embedding provider (OpenAI-compatible)"
     )
+    VECTOR_EF_SEARCH: int = Field(
+        default=100,
+        ge=1,
+        le=1000,
+        description="pgvector HNSW ef_search used by similarity search (higher = better recall, slower)"
+    )
 
     # LLM Configuration (Librarian)
     LIBRARIAN_MODE: str = Field(
@@ -153,7 +210,22 @@ class Settings(BaseSettings):
         default=False,
         description="Enable verbose logging for LLM tool calls and responses"
     )
-    
+    LIBRARIAN_CACHE_TTL: int = Field(
+        default=300,
+        ge=0,
+        description="Seconds to reuse a librarian answer for the same history and question (0 disables)"
+    )
+    BATCH_EVAL_CONCURRENCY: int = Field(
+        default=8,
+        ge=1,
+        description="Maximum number of concurrent AI judge calls during batch evaluation"
+    )
+    CURRICULUM_MAX_WORKERS: int = Field(
+        default=4,
+        ge=1,
+        description="Worker threads for background curriculum generation jobs"
+    )
+
     # Frontend Configuration
     STATIC_DIR: str = Field(
         default="static",
@@ -4,23 +4,125 @@ Curriculum curator for generating training tasks from failed traces.
 
 from __future__ import annotations
 
-from typing import List, Dict, Any, Optional
-import json
+from collections import defaultdict
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Iterable, Iterator, List, Dict, Any, NamedTuple, Optional, Tuple
+import functools
 import logging
 import re
+import sys
+import threading
 
-from sqlalchemy import func, cast, Integer
+import orjson
+from sqlalchemy import func, cast, select, insert, true, Integer
 from sqlalchemy.dialects.postgresql import JSONB
-from sqlalchemy.orm import selectinload
 
+from tracebrain.config import settings
 from tracebrain.core.llm_providers import select_provider, ProviderError
-from tracebrain.db.base import Trace, CurriculumTask, TraceStatus
+from tracebrain.db.base import Trace, Span, CurriculumTask, TraceStatus
 
 logger = logging.getLogger(__name__)
 
+_FENCE_RE = re.compile(r"^```(json)?", re.IGNORECASE)
+_JSON_ARRAY_RE = re.compile(r"\[.*\]", re.DOTALL)
+
+# Span attribute keys read by the curriculum summary, extracted in one pass per span.
+_SPAN_KEYS = tuple(
+    sys.intern(key)
+    for key in (
+        "tracebrain.span.type",
+        "tracebrain.tool.name",
+        "tracebrain.tool.output",
+        "otel.status_code",
+        "otel.status_description",
+    )
+)
+
+
+class FailedTrace(NamedTuple):
+    """Narrow projection of a failed trace and its most recent spans."""
+
+    id: str
+    status: Any
+    feedback: Optional[Dict[str, Any]]
+    attributes: Optional[Dict[str, Any]]
+    spans: List[Any]
+
+
+_ERROR_MARKERS = (
+    "error",
+    "exception",
+    "failed",
+    "failure",
+    "timeout",
+    "timed out",
+    "rate limit",
+    "unauthorized",
+    "forbidden",
+    "not found",
+    "invalid",
+    "traceback",
+    "stack trace",
+)
+_STATUS_CODE_PATTERN = r"\b[4-5]\d{2}\b"
+_STATUS_CODE_RE = re.compile(_STATUS_CODE_PATTERN)
+# Error markers and 4xx/5xx status codes fused into one pattern so each
+# tool output is scanned once when pyahocorasick is not installed.
+_ERROR_RE = re.compile(
+    "|".join(map(re.escape, _ERROR_MARKERS)) + "|" + _STATUS_CODE_PATTERN,
+    re.IGNORECASE,
+)
+
+
+def _build_marker_automaton():
+    """Build an Aho-Corasick automaton over the error markers, if available."""
+    try:
+        import ahocorasick
+    except ImportError:
+        return None
+    automaton = ahocorasick.Automaton()
+    for marker in _ERROR_MARKERS:
+        automaton.add_word(marker, marker)
+    automaton.make_automaton()
+    return automaton
+
+
+_MARKER_AUTOMATON = _build_marker_automaton()
+
+
+def _has_error_signal(text: str) -> bool:
+    """Return True if text contains an error marker or a 4xx/5xx status code."""
+    if _MARKER_AUTOMATON is None:
+        return _ERROR_RE.search(text) is not None
+    if next(_MARKER_AUTOMATON.iter(text.lower()), None) is not None:
+        return True
+    return _STATUS_CODE_RE.search(text) is not None
+
+
+_executor: Optional[ThreadPoolExecutor] = None
+_executor_lock = threading.Lock()
+
+
+def _get_executor() -> ThreadPoolExecutor:
+    """Return the shared executor used for background curriculum generation."""
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(
+                    max_workers=settings.CURRICULUM_MAX_WORKERS,
+                    thread_name_prefix="tracebrain-curriculum",
+                )
+    return _executor
+
+
+def _status_str(status: Any) -> str:
+    """Return the plain string form of a TraceStatus enum or raw status value."""
+    return getattr(status, "value", None) or str(status)
+
 
 class CurriculumCurator:
-    VALID_ERROR_TYPES = {
+    VALID_ERROR_TYPES = frozenset({
         "logic_loop",
         "hallucination",
         "invalid_tool_usage",
@@ -30,75 +132,142 @@ class CurriculumCurator:
         "context_overflow",
         "general_failure",
         "none",
-    }
+    })
 
     def __init__(self, store):
         self.store = store
-        self.provider = None
-        self.provider_error: str | None = None
+        self._provider = None
+        self._provider_error: str | None = None
+        self._provider_initialized = False
+
+    def _init_provider(self) -> None:
+        # Resolved on first use so callers that only query traces skip provider setup.
+        if self._provider_initialized:
+            return
+        self._provider_initialized = True
         try:
-            self.provider = select_provider()
+            self._provider = select_provider()
         except ProviderError as exc:
-            self.provider_error = str(exc)
+            self._provider_error = str(exc)
+
+    @property
+    def provider(self):
+        self._init_provider()
+        return self._provider
+
+    @provider.setter
+    def provider(self, value) -> None:
+        self._provider = value
+        self._provider_error = None
+        self._provider_initialized = True
+
+    @property
+    def provider_error(self) -> str | None:
+        self._init_provider()
+        return self._provider_error
 
     def find_failed_traces(
         self,
         limit: int = 20,
         error_types: Optional[List[str]] = None,
-    ) -> List[Trace]:
+    ) -> List[FailedTrace]:
+        """Return the most recent failed traces with only their last 5 spans loaded."""
         normalized_error_types = self._normalize_error_types(error_types)
         session = self.store.get_session()
         try:
-            query = session.query(Trace).options(selectinload(Trace.spans))
-            if not self.store.is_sqlite:
+            if self.store.is_sqlite:
+                rating_value = func.json_extract(Trace.feedback, "$.rating")
+                error_type_value = func.json_extract(
+                    Trace.attributes, '$."tracebrain.ai_evaluation".error_type'
+                )
+            else:
                 rating_value = cast(
                     func.jsonb_extract_path_text(cast(Trace.feedback, JSONB), "rating"),
                     Integer,
                 )
-                query = query.filter(
-                    (rating_value < 3)
-                    | (Trace.status == TraceStatus.failed)
-                    | (Trace.status == "ERROR")
+                error_type_value = func.jsonb_extract_path_text(
+                    cast(Trace.attributes, JSONB), "tracebrain.ai_evaluation", "error_type"
+                )
+
+            stmt = select(Trace.id, Trace.status, Trace.feedback, Trace.attributes).where(
+                (rating_value < 3)
+                | (Trace.status == TraceStatus.failed)
+                | (Trace.status == "ERROR")
+            )
+            if normalized_error_types:
+                stmt = stmt.where(
+                    func.coalesce(func.nullif(error_type_value, ""), "general_failure").in_(
+                        normalized_error_types
+                    )
                 )
-                if normalized_error_types:
-                    query = query.filter(
-                        Trace.attributes["tracebrain.ai_evaluation"]["error_type"].astext.in_(
-                            normalized_error_types
+            trace_rows = session.execute(
+                stmt.order_by(Trace.created_at.desc()).limit(limit)
+            ).all()
+            if not trace_rows:
+                return []
+
+            trace_ids = [row.id for row in trace_rows]
+            if self.store.is_sqlite:
+                # Rank spans per trace newest-first and keep only the last five.
+                ranked = (
+                    select(
+                        Span.trace_id,
+                        Span.name,
+                        Span.attributes,
+                        Span.start_time,
+                        Span.id,
+                        func.row_number()
+                        .over(
+                            partition_by=Span.trace_id,
+                            order_by=(Span.start_time.desc(), Span.id.desc()),
                         )
+                        .label("rn"),
                     )
-                return (
-                    query.order_by(Trace.created_at.desc())
-                    .limit(limit)
-                    .all()
+                    .where(Span.trace_id.in_(trace_ids))
+                    .subquery("recent_spans")
+                )
+                span_stmt = (
+                    select(ranked.c.trace_id, ranked.c.name, ranked.c.attributes)
+                    .where(ranked.c.rn <= 5)
+                    .order_by(ranked.c.trace_id, ranked.c.start_time, ranked.c.id)
+                )
+            else:
+                # LATERAL lets Postgres stop after five rows per trace using the
+                # (trace_id, start_time) index instead of ranking every span.
+                failed_ids = select(Trace.id).where(Trace.id.in_(trace_ids)).subquery("failed_ids")
+                recent = (
+                    select(Span.trace_id, Span.name, Span.attributes, Span.start_time, Span.id)
+                    .where(Span.trace_id == failed_ids.c.id)
+                    .order_by(Span.start_time.desc(), Span.id.desc())
+                    .limit(5)
+                    .lateral("recent_spans")
                 )
+                span_stmt = (
+                    select(recent.c.trace_id, recent.c.name, recent.c.attributes)
+                    .select_from(failed_ids)
+                    .join(recent, true())
+                    .order_by(recent.c.trace_id, recent.c.start_time, recent.c.id)
+                )
+            span_rows = session.execute(span_stmt).all()
 
-            traces = (
-                query.order_by(Trace.created_at.desc())
-                .all()
-            )
-            results: List[Trace] = []
-            for trace in traces:
-                rating = None
-                if trace.feedback and isinstance(trace.feedback, dict):
-                    rating = trace.feedback.get("rating")
-                error_type = "general_failure"
-                if isinstance(trace.attributes, dict):
-                    ai_eval = trace.attributes.get("tracebrain.ai_evaluation") or {}
-                    if isinstance(ai_eval, dict):
-                        error_type = str(ai_eval.get("error_type") or "general_failure")
-                if (
-                    (isinstance(rating, int) and rating < 3)
-                    or trace.status == TraceStatus.failed
-                    or str(trace.status).upper() == "ERROR"
-                ):
-                    if normalized_error_types and error_type not in normalized_error_types:
-                        continue
-                    results.append(trace)
-            return results[:limit]
+            spans_by_trace: Dict[str, List[Any]] = defaultdict(list)
+            for span_row in span_rows:
+                spans_by_trace[span_row.trace_id].append(span_row)
+
+            return [
+                FailedTrace(
+                    id=row.id,
+                    status=row.status,
+                    feedback=row.feedback,
+                    attributes=row.attributes,
+                    spans=spans_by_trace.get(row.id, []),
+                )
+                for row in trace_rows
+            ]
         finally:
             session.close()
 
-    def _summarize_traces(self, traces: List[Trace]) -> str:
+    def _summarize_traces(self, traces: List[FailedTrace]) -> str:
         lines = []
         for trace in traces:
             feedback_comment = ""
@@ -117,82 +286,146 @@ class CurriculumCurator:
             recent_spans = (trace.spans or [])[-5:]
             for span in recent_spans:
                 attrs = span.attributes or {}
-                span_type = attrs.get("tracebrain.span.type")
+                span_type, tool_name, raw_output, status_code, status_desc = map(
+                    attrs.get, _SPAN_KEYS
+                )
                 span_name = (span.name or "").lower()
 
                 if span_type == "tool_execution" or "tool execution" in span_name:
-                    tool_name = attrs.get("tracebrain.tool.name") or span.name
-                    tool_output = str(attrs.get("tracebrain.tool.output", ""))[:200]
+                    tool_name = tool_name or span.name
+                    raw_output = raw_output or ""
+                    tool_output = (
+                        raw_output[:200] if isinstance(raw_output, str) else str(raw_output)[:200]
+                    )
                     if tool_name:
                         tool_usage.append(f"Tool: {tool_name}")
 
-                    lower_output = tool_output.lower()
-                    error_markers = (
-                        "error",
-                        "exception",
-                        "failed",
-                        "failure",
-                        "timeout",
-                        "timed out",
-                        "rate limit",
-                        "unauthorized",
-                        "forbidden",
-                        "not found",
-                        "invalid",
-                        "traceback",
-                        "stack trace",
-                    )
-                    has_error_marker = any(marker in lower_output for marker in error_markers)
-                    has_status_code = re.search(r"\b[4-5]\d{2}\b", tool_output) is not None
-                    if has_error_marker or has_status_code:
+                    if _has_error_signal(tool_output):
                         error_details.append(f"Tool Error: {tool_output}")
 
-                if attrs.get("otel.status_code") == "ERROR":
-                    desc = attrs.get("otel.status_description", "Unknown Error")
-                    error_details.append(f"Span Error: {desc}")
+                if status_code == "ERROR":
+                    error_details.append(f"Span Error: {status_desc or 'Unknown Error'}")
 
-            status = trace.status.value if hasattr(trace.status, "value") else str(trace.status)
-            summary_line = (
-                f"Trace ID: {trace.id[-6:]} | Status: {status} | Error Type: {error_type}"
-            )
+            parts = [
+                f"Trace ID: {trace.id[-6:]}",
+                f"Status: {_status_str(trace.status)}",
+                f"Error Type: {error_type}",
+            ]
             if feedback_comment:
-                summary_line += f" | Human Feedback: {feedback_comment}"
+                parts.append(f"Human Feedback: {feedback_comment}")
             if tool_usage:
-                summary_line += f" | Actions: {', '.join(tool_usage)}"
+                parts.append(f"Actions: {', '.join(tool_usage)}")
             if error_details:
-                summary_line += f" | ERRORS FOUND: {'; '.join(error_details)}"
+                parts.append(f"ERRORS FOUND: {'; '.join(error_details)}")
 
-            lines.append(summary_line)
+            lines.append(" | ".join(parts))
 
         return "\n".join(lines)
 
     def _extract_json(self, text: str) -> List[Dict[str, Any]]:
         cleaned = (text or "").strip()
         if cleaned.startswith("```"):
-            cleaned = re.sub(r"^```(json)?", "", cleaned, flags=re.IGNORECASE).strip()
+            cleaned = _FENCE_RE.sub("", cleaned).strip()
             if cleaned.endswith("```"):
                 cleaned = cleaned[:-3].strip()
         try:
-            return json.loads(cleaned)
-        except json.JSONDecodeError:
-            match = re.search(r"\[.*\]", cleaned, flags=re.DOTALL)
+            return orjson.loads(cleaned)
+        except orjson.JSONDecodeError:
+            match = _JSON_ARRAY_RE.search(cleaned)
             if not match:
                 raise
-            return json.loads(match.group(0))
+            return orjson.loads(match.group(0))
+
+    def _iter_json_objects(self, chunks: Iterable[str], buffer: List[str]) -> Iterator[Any]:
+        """Yield each object of a top-level JSON list as soon as it is complete.
+
+        Every chunk is also appended to ``buffer`` so the caller can fall back to
+        ``_extract_json`` on the full text when the stream is not a clean list.
+        """
+        depth = 0
+        in_string = False
+        escaped = False
+        started = False
+        item: List[str] = []
+        for chunk in chunks:
+            buffer.append(chunk)
+            for char in chunk:
+                if depth >= 2:
+                    item.append(char)
+                if in_string:
+                    if escaped:
+                        escaped = False
+                    elif char == "\\":
+                        escaped = True
+                    elif char == '"':
+                        in_string = False
+                    continue
+                if char == '"':
+                    in_string = started
+                elif char in "[{":
+                    if not started:
+                        if char == "[":
+                            started = True
+                            depth = 1
+                        continue
+                    depth += 1
+                    if depth == 2:
+                        item = [char]
+                elif char in "]}":
+                    if not started:
+                        continue
+                    depth -= 1
+                    if depth == 1 and item:
+                        yield orjson.loads("".join(item))
+                        item = []
+                    elif depth == 0:
+                        return
+
+    def _task_row(self, item: Any) -> Optional[Dict[str, str]]:
+        if not isinstance(item, dict):
+            return None
+        task = str(item.get("task", "")).strip()
+        reasoning = str(item.get("reasoning", "")).strip()
+        priority = str(item.get("priority", "medium")).strip().lower() or "medium"
+        if priority not in {"high", "medium", "low"}:
+            priority = "medium"
+        if not task or not reasoning:
+            return None
+        return {
+            "task_description": task,
+            "reasoning": reasoning,
+            "priority": priority,
+            "status": "pending",
+        }
 
     def _normalize_error_types(
         self,
-        error_types: Optional[List[str]],
-    ) -> Optional[List[str]]:
+        error_types: Optional[Iterable[str]],
+    ) -> Optional[Tuple[str, ...]]:
         if not error_types:
             return None
-        normalized = []
-        for value in error_types:
-            key = str(value).strip()
-            if key in self.VALID_ERROR_TYPES:
-                normalized.append(key)
+        return self._normalize_error_types_cached(tuple(error_types))
+
+    @staticmethod
+    @functools.lru_cache(maxsize=32)
+    def _normalize_error_types_cached(values: Tuple[str, ...]) -> Optional[Tuple[str, ...]]:
+        normalized = tuple(
+            key
+            for key in (str(value).strip() for value in values)
+            if key in CurriculumCurator.VALID_ERROR_TYPES
+        )
         return normalized or None
 
+    def generate_curriculum_async(
+        self,
+        error_types: Optional[List[str]] = None,
+        limit: int = 5,
+    ) -> "Future[int]":
+        """Run generate_curriculum on the shared worker pool and return its future."""
+        return _get_executor().submit(
+            self.generate_curriculum, error_types=error_types, limit=limit
+        )
+
     def generate_curriculum(
         self,
         error_types: Optional[List[str]] = None,
@@ -230,39 +463,47 @@ class CurriculumCurator:
             f"\n### FAILED TRACES LOG:\n{summary}"
         )
 
+        # Parse tasks as their objects close in the stream and insert them all
+        # in one executemany once it ends; fall back to whole-text parsing if
+        # the reply is not a clean JSON list.
         session = self.provider.start_chat(system_prompt, [])
-        response = self.provider.send_user_message(session, user_prompt)
-        raw_text = self.provider.extract_text(response)
+        chunks = self.provider.stream_user_message(session, user_prompt)
+        buffer: List[str] = []
+        rows: Dict[str, Dict[str, str]] = {}
+        stream_ok = True
+        try:
+            for item in self._iter_json_objects(chunks, buffer):
+                row = self._task_row(item)
+                if row:
+                    rows.setdefault(row["task_description"], row)
+        except orjson.JSONDecodeError:
+            stream_ok = False
+        buffer.extend(chunks)
+
+        if not (rows and stream_ok):
+            try:
+                tasks_payload = self._extract_json("".join(buffer))
+            except orjson.JSONDecodeError:
+                if not rows:
+                    raise
+            else:
+                if not isinstance(tasks_payload, list):
+                    raise ValueError("Invalid curriculum output; expected a list")
+                for row in map(self._task_row, tasks_payload):
+                    if row:
+                        rows.setdefault(row["task_description"], row)
 
-        tasks_payload = self._extract_json(raw_text)
-        if not isinstance(tasks_payload, list):
-            raise ValueError("Invalid curriculum output; expected a list")
+        return self._save_tasks(list(rows.values()))
 
-        created = 0
+    def _save_tasks(self, rows: List[Dict[str, str]]) -> int:
+        """Insert curriculum task rows in one short transaction and return the count."""
+        if not rows:
+            return 0
         db_session = self.store.get_session()
         try:
-            for item in tasks_payload:
-                if not isinstance(item, dict):
-                    continue
-                task = str(item.get("task", "")).strip()
-                reasoning = str(item.get("reasoning", "")).strip()
-                priority = str(item.get("priority", "medium")).strip().lower() or "medium"
-                if priority not in {"high", "medium", "low"}:
-                    priority = "medium"
-                if not task or not reasoning:
-                    continue
-
-                db_session.add(
-                    CurriculumTask(
-                        task_description=task,
-                        reasoning=reasoning,
-                        priority=priority,
-                        status="pending",
-                    )
-                )
-                created += 1
+            db_session.execute(insert(CurriculumTask), rows)
             db_session.commit()
-            return created
+            return len(rows)
         except Exception:
             db_session.rollback()
             logger.exception("Failed to save curriculum tasks")
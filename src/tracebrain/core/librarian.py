@@ -7,22 +7,87 @@ memory, self-correction, and interactive abstention.
 
 from __future__ import annotations
 
-from typing import Dict, List, Optional, Any
+from typing import Dict, FrozenSet, List, Optional, Any, Tuple
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
-import json
+from functools import lru_cache
+import copy
+import hashlib
 import logging
 import re
+import sys
+import threading
 
+import orjson
 import sqlparse
+from cachetools import LRUCache, TTLCache
 
 from tracebrain.config import settings
-from tracebrain.core.llm_providers import select_provider, is_provider_available, BaseProvider
+from tracebrain.core.llm_providers import get_provider, is_provider_available, BaseProvider
 from tracebrain.core.schema import TraceBrainAttributes
 
 logger = logging.getLogger(__name__)
 
-
-def _build_schema_context() -> str:
+_FENCE_RE = re.compile(r"^```(json)?", re.IGNORECASE)
+_JSON_OBJ_RE = re.compile(r"\{.*\}", re.DOTALL)
+_HEX32_RE = re.compile(r"[a-f0-9]{32}")
+_SQL_FENCE_RE = re.compile(r"```(?:sql)?\s*(.*?)```", re.IGNORECASE | re.DOTALL)
+_SELECT_RE = re.compile(r"SELECT\s+.*", re.IGNORECASE | re.DOTALL)
+_SELECT_ONLY_RE = re.compile(
+    r"^(?:\s|--[^\n]*(?:\n|$)|/\*.*?\*/)*(WITH\s+.+?\s+)?SELECT\b", re.IGNORECASE | re.DOTALL
+)
+# Questions worth a single synthesized SQL query before the tool planner:
+# counts, aggregates and listings, but never semantic "similar to" searches,
+# which need search_similar_traces.
+_TABULAR_QUESTION_RE = re.compile(
+    r"\b(how many|count|number of|average|avg|total|sum|minimum|maximum|min|max|"
+    r"top \d+|most|least|percent(age)?|ratio|per|group(ed)? by|distribution|"
+    r"breakdown|list)\b",
+    re.IGNORECASE,
+)
+_SEMANTIC_QUESTION_RE = re.compile(
+    r"\b(similar|semantic(ally)?|resembl\w*|like this|related to)\b", re.IGNORECASE
+)
+# NumPy arrays show up as pgvector embedding values in raw SQL rows.
+_ORJSON_OPTIONS = orjson.OPT_NAIVE_UTC | orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY
+
+# Budget for SQL rows forwarded to the LLM in a single tool result.
+_MAX_RESULT_ROWS = 100
+_MAX_RESULT_BYTES = 32 * 1024
+
+# SQL retry budget for providers without tool calling: once more than
+# _SQL_FAILURE_THRESHOLD of a session's last _SQL_OUTCOME_WINDOW attempts
+# failed, further retries are unlikely to help and only one attempt is made.
+_MAX_SQL_ATTEMPTS = 3
+_SQL_OUTCOME_WINDOW = 20
+_SQL_FAILURE_THRESHOLD = 15
+
+# Chat roles and tool names, interned once and shared by every saved message.
+_ROLE_USER = sys.intern("user")
+_ROLE_ASSIST = sys.intern("assistant")
+_ROLE_TOOL = sys.intern("tool")
+_TOOL_SQL = sys.intern("run_sql_query")
+_TOOL_SEARCH = sys.intern("search_similar_traces")
+
+# Reuse results of equivalent SQL issued within a short window while no data
+# has been written through the store.
+_SQL_CACHE_SIZE = 256
+_SQL_CACHE_TTL = 60
+
+# Token budget for conversation history included in a librarian prompt.
+_HISTORY_TOKEN_BUDGET = 2000
+
+# Upper bound on trace ids scraped from a free-text answer.
+_MAX_EXTRACTED_SOURCES = 16
+
+
+def _build_schema_lines() -> List[Tuple[str, str]]:
+    """Return the schema description as (section, text) pieces.
+
+    Sections are "traces" (always included), "spans" and "ai_eval"; joining
+    every piece in order gives the full SCHEMA_CONTEXT.
+    """
     ai_eval_key = TraceBrainAttributes.AI_EVALUATION.value
     ai_conf = TraceBrainAttributes.AI_CONFIDENCE.value
     ai_rating = TraceBrainAttributes.AI_RATING.value
@@ -31,51 +96,59 @@ def _build_schema_context() -> str:
     span_type = TraceBrainAttributes.SPAN_TYPE.value
     tool_name = TraceBrainAttributes.TOOL_NAME.value
 
-    return (
-        "PostgreSQL schema (read-only):\n\n"
-        "Table: traces\n"
-        "- id (string, primary key)\n"
-        "- system_prompt (text)\n"
-        "- episode_id (string)\n"
-        "- created_at (timestamp)\n"
-        "- feedback (jsonb)\n"
-        "- attributes (jsonb)\n\n"
-        "Table: spans\n"
-        "- id (integer, primary key)\n"
-        "- span_id (string)\n"
-        "- trace_id (string, foreign key -> traces.id)\n"
-        "- parent_id (string)\n"
-        "- name (string)\n"
-        "- start_time (timestamp)\n"
-        "- end_time (timestamp)\n"
-        "- attributes (jsonb)\n\n"
-        "AI Evaluation object:\n"
-        f"- traces.attributes contains '{ai_eval_key}' (JSONB object)\n"
-        f"  - '{ai_rating}': integer (1-5)\n"
-        f"  - '{ai_conf}': float (0.0-1.0). High uncertainty is < 0.5\n"
-        f"  - '{ai_status}': string (pending_review, auto_verified, completed)\n"
-        f"  - '{ai_feedback}': string (AI rationale)\n\n"
-        "JSONB usage examples (use ->> for text comparisons):\n"
-        f"- spans.attributes->>'{span_type}'\n"
-        f"- spans.attributes->>'{tool_name}'\n"
-        "- spans.attributes->>'otel.status_code'\n"
-        "- traces.feedback->>'rating'\n"
-        f"- traces.attributes->'{ai_eval_key}'->>'{ai_conf}'\n\n"
-        "Advanced SQL examples:\n"
-        f"- Uncertainty query: SELECT id FROM traces WHERE (attributes->'{ai_eval_key}'->>'{ai_conf}')::float < 0.5\n"
-        f"- Feedback search: SELECT id FROM traces WHERE attributes->'{ai_eval_key}'->>'{ai_feedback}' ILIKE '%loop%'\n"
-        "- Time filter: created_at > now() - interval '24 hours'\n"
-        "- Metadata join: spans.trace_id = traces.id\n"
-    ).strip()
+    return [
+        ("traces", "PostgreSQL schema (read-only):\n\n"),
+        ("traces", "Table: traces\n"),
+        ("traces", "- id (string, primary key)\n"),
+        ("traces", "- system_prompt (text)\n"),
+        ("traces", "- episode_id (string)\n"),
+        ("traces", "- created_at (timestamp)\n"),
+        ("traces", "- feedback (jsonb)\n"),
+        ("traces", "- attributes (jsonb)\n\n"),
+        ("spans", "Table: spans\n"),
+        ("spans", "- id (integer, primary key)\n"),
+        ("spans", "- span_id (string)\n"),
+        ("spans", "- trace_id (string, foreign key -> traces.id)\n"),
+        ("spans", "- parent_id (string)\n"),
+        ("spans", "- name (string)\n"),
+        ("spans", "- start_time (timestamp)\n"),
+        ("spans", "- end_time (timestamp)\n"),
+        ("spans", "- attributes (jsonb)\n\n"),
+        ("ai_eval", "AI Evaluation object:\n"),
+        ("ai_eval", f"- traces.attributes contains '{ai_eval_key}' (JSONB object)\n"),
+        ("ai_eval", f"  - '{ai_rating}': integer (1-5)\n"),
+        ("ai_eval", f"  - '{ai_conf}': float (0.0-1.0). High uncertainty is < 0.5\n"),
+        ("ai_eval", f"  - '{ai_status}': string (pending_review, auto_verified, completed)\n"),
+        ("ai_eval", f"  - '{ai_feedback}': string (AI rationale)\n\n"),
+        ("traces", "JSONB usage examples (use ->> for text comparisons):\n"),
+        ("spans", f"- spans.attributes->>'{span_type}'\n"),
+        ("spans", f"- spans.attributes->>'{tool_name}'\n"),
+        ("spans", "- spans.attributes->>'otel.status_code'\n"),
+        ("traces", "- traces.feedback->>'rating'\n"),
+        ("ai_eval", f"- traces.attributes->'{ai_eval_key}'->>'{ai_conf}'\n"),
+        ("traces", "\n"),
+        ("traces", "Advanced SQL examples:\n"),
+        ("ai_eval", f"- Uncertainty query: SELECT id FROM traces WHERE (attributes->'{ai_eval_key}'->>'{ai_conf}')::float < 0.5\n"),
+        ("ai_eval", f"- Feedback search: SELECT id FROM traces WHERE attributes->'{ai_eval_key}'->>'{ai_feedback}' ILIKE '%loop%'\n"),
+        ("traces", "- Time filter: created_at > now() - interval '24 hours'\n"),
+        ("spans", "- Metadata join: spans.trace_id = traces.id\n"),
+    ]
+
+
+_SCHEMA_LINES = _build_schema_lines()
+
+
+def _build_schema_context(sections: FrozenSet[str] = frozenset({"traces", "spans", "ai_eval"})) -> str:
+    return "".join(text for section, text in _SCHEMA_LINES if section in sections).strip()
 
 
 SCHEMA_CONTEXT = _build_schema_context()
 
 
-def _build_tool_specs() -> List[Dict[str, Any]]:
-    return [
+def _build_tool_specs() -> Tuple[Dict[str, Any], ...]:
+    return (
         {
-            "name": "run_sql_query",
+            "name": _TOOL_SQL,
             "description": "Execute a read-only SQL SELECT query against the TraceStore database.",
             "parameters": {
                 "type": "object",
@@ -90,7 +163,7 @@ def _build_tool_specs() -> List[Dict[str, Any]]:
         }
         ,
         {
-            "name": "search_similar_traces",
+            "name": _TOOL_SEARCH,
             "description": "Find semantically similar traces using vector search.",
             "parameters": {
                 "type": "object",
@@ -112,90 +185,366 @@ def _build_tool_specs() -> List[Dict[str, Any]]:
                 },
                 "required": ["query"],
             },
-        }
-    ]
-
+        },
+    )
+
+
+_TOOL_SPECS = _build_tool_specs()
+
+_SYSTEM_PROMPT_HEADER = (
+    "You are the TraceBrain AI Librarian, an expert in Agent Operations (AgentOps). "
+    "Your task is to analyze agent execution traces to help human experts diagnose issues.\n\n"
+    "NEVER show raw SQL queries or technical tool outputs to the end-user in the 'answer' field. "
+    "Your final response MUST ALWAYS be a valid JSON object with 'answer', 'suggestions', and 'sources' keys. "
+    "The 'answer' should be a natural language summary of what you found in the database.\n\n"
+
+    "### CORE TOOLS:\n"
+    "1. run_sql_query: Use this for counts, status filters, time-based queries, and metadata analysis.\n"
+    "2. search_similar_traces: Use this ONLY when the user asks for 'similar' cases or semantic patterns in reasoning/thoughts.\n\n"
+
+    "### CRITICAL SQL RULES:\n"
+    "- All timestamps are in UTC. Use 'now() - interval X hours' for relative time queries.\n"
+    "- To see agent thoughts or tool outputs, you MUST JOIN 'traces' and 'spans' on 'spans.trace_id = traces.id'.\n"
+    "- For JSONB fields, use '->>' to get values as text (e.g., attributes->>'tracebrain.tool.name').\n"
+    "- Only perform SELECT queries. If the database returns EMPTY_RESULT, do not guess; explain that no data matches the criteria.\n\n"
+
+    "### OUTPUT FORMAT (Strict JSON):\n"
+    "{"
+    "\"answer\": \"A concise summary of findings. Mention specific errors or patterns found.\", "
+    "\"suggestions\": [{\"label\": \"Follow-up question\", \"value\": \"Exact query text\"}], "
+    "\"sources\": [\"list of trace_ids discovered\"]"
+    "}\n\n"
+)
+
+# Question keywords that pull optional schema sections into the prompt. The
+# traces table is always described; matching is done on the question plus the
+# conversation history so follow-ups keep the sections they relied on.
+_SCHEMA_SECTION_KEYWORDS: Dict[str, Tuple[str, ...]] = {
+    "spans": (
+        "span", "tool", "step", "thought", "reason", "error", "fail", "output",
+        "call", "latency", "duration", "slow", "loop", "action", "observation",
+    ),
+    "ai_eval": (
+        "ai ", "judge", "confiden", "uncertain", "rating", "rated", "evaluat",
+        "review", "verified", "rationale", "score", "quality",
+    ),
+}
+
+
+def _build_system_prompts() -> Dict[FrozenSet[str], Tuple[str, str]]:
+    """Precompute every schema-section combination with its prompt-cache key."""
+    prompts: Dict[FrozenSet[str], Tuple[str, str]] = {}
+    optional = list(_SCHEMA_SECTION_KEYWORDS)
+    for mask in range(1 << len(optional)):
+        sections = frozenset(
+            ["traces"] + [name for bit, name in enumerate(optional) if mask & (1 << bit)]
+        )
+        prompt = _SYSTEM_PROMPT_HEADER + _build_schema_context(sections)
+        cache_key = hashlib.blake2b(prompt.encode("utf-8"), digest_size=8).hexdigest()
+        prompts[sections] = (prompt, cache_key)
+    return prompts
+
+
+_SYSTEM_PROMPTS = _build_system_prompts()
+
+
+def _system_prompt_for(text: str) -> Tuple[str, str]:
+    """Return the (system prompt, prompt-cache key) whose schema covers text."""
+    lowered = text.lower()
+    sections = frozenset(
+        ["traces"]
+        + [
+            name
+            for name, keywords in _SCHEMA_SECTION_KEYWORDS.items()
+            if any(keyword in lowered for keyword in keywords)
+        ]
+    )
+    return _SYSTEM_PROMPTS[sections]
+
+_ABSTAIN_SYSTEM_PROMPT = (
+    "You are the TraceBrain AI Librarian expert. The database returned EMPTY_RESULT for the user's request.\n\n"
+    "### YOUR TASK:\n"
+    "1. Analyze the User Question and explain politely that no traces currently match those specific criteria.\n"
+    "2. Identify potential reasons for the empty result (e.g., a time range that is too narrow, a specific error code that hasn't occurred, or a tool name typo).\n"
+    "3. Provide 3-4 ACTIONABLE suggestions to help the user find what they need. These should be formatted as direct questions or commands the user can click.\n\n"
+    "### SUGGESTION GUIDELINES:\n"
+    "- 'Broaden Time': Suggest looking back further (e.g., last 7 days).\n"
+    "- 'Relax Filters': If they asked for errors, suggest looking for all traces of that tool.\n"
+    "- 'Semantic Search': Suggest using natural language to find 'similar behavior' instead of exact SQL matches.\n\n"
+    "### OUTPUT RULES:\n"
+    "Return ONLY a strict JSON object:\n"
+    "{\n"
+    "  \"answer\": \"A professional explanation of why no data was found and what might be the cause.\",\n"
+    "  \"suggestions\": [\n"
+    "    {\"label\": \"Short label for UI button\", \"value\": \"The full natural language query to try next\"}\n"
+    "  ],\n"
+    "  \"sources\": []\n"
+    "}"
+)
+
+_ABSTAIN_PROMPT_CACHE_KEY = hashlib.blake2b(_ABSTAIN_SYSTEM_PROMPT.encode("utf-8"), digest_size=8).hexdigest()
 
 LIBRARIAN_AVAILABLE = is_provider_available()
 
 
+def _first_sqlparse_select(sql: str) -> Optional[str]:
+    """Return the first statement sqlparse classifies as SELECT, if any."""
+    for statement in sqlparse.parse(sql):
+        if statement.get_type() == "SELECT":
+            return str(statement).strip()
+    return None
+
+
+def _first_select_statement(sql: str) -> Optional[str]:
+    """Return the original text of the first read-only SELECT statement in sql.
+
+    Statements are split with sqlparse. When sqlglot is installed its AST is used
+    to validate each one, which also rejects SELECTs that embed data-modifying
+    statements (e.g. in a CTE); statements sqlglot cannot tokenize or parse fall
+    back to the sqlparse check. The returned text is never regenerated, so
+    dialect-specific syntax reaches the database unchanged.
+    """
+    try:
+        import sqlglot
+        from sqlglot import exp
+    except ImportError:
+        return _first_sqlparse_select(sql)
+
+    for raw in sqlparse.split(sql):
+        statement = raw.strip()
+        if not statement:
+            continue
+        try:
+            tree = sqlglot.parse_one(statement, read="postgres")
+        except sqlglot.errors.SqlglotError:
+            if _first_sqlparse_select(statement):
+                return statement
+            continue
+        if not isinstance(tree, exp.Query):
+            continue
+        if tree.find(exp.Insert, exp.Update, exp.Delete, exp.Drop, exp.Command) is not None:
+            continue
+        return statement
+    return None
+
+
+def _canonical_sql(sql: str) -> str:
+    """Return a whitespace/case-insensitive form of sql for use as a cache key."""
+    try:
+        import sqlglot
+    except ImportError:
+        sqlglot = None
+    if sqlglot is not None:
+        try:
+            return sqlglot.transpile(sql, read="postgres", write="postgres", pretty=False)[0]
+        except (sqlglot.errors.SqlglotError, IndexError):
+            pass
+    formatted = sqlparse.format(
+        sql, keyword_case="upper", strip_comments=True, strip_whitespace=True
+    )
+    return formatted.strip().rstrip(";").strip()
+
+
+@lru_cache(maxsize=1)
+def _get_token_encoder():
+    """Return the tiktoken encoder used for history budgeting, or None if unavailable."""
+    try:
+        import tiktoken
+    except ImportError:
+        return None
+    try:
+        # The BPE file is downloaded on first use, which fails offline.
+        return tiktoken.get_encoding("o200k_base")
+    except Exception:
+        logger.warning("tiktoken encoder unavailable; estimating history tokens", exc_info=True)
+        return None
+
+
+def _count_tokens(lines: List[str]) -> List[int]:
+    encoder = _get_token_encoder()
+    if encoder is not None:
+        try:
+            return [len(tokens) for tokens in encoder.encode_ordinary_batch(lines)]
+        except Exception:
+            logger.warning("tiktoken encoding failed; estimating history tokens", exc_info=True)
+    # Roughly four characters per token for English text.
+    return [len(line) // 4 + 1 for line in lines]
+
+
+def _truncate_history(history_text: str, budget: int = _HISTORY_TOKEN_BUDGET) -> str:
+    """Keep the most recent history lines that fit in budget tokens."""
+    if len(history_text) // 4 <= budget // 2:
+        # Far below the budget by any tokenizer; skip counting.
+        return history_text
+    lines = history_text.splitlines()
+    kept = 0
+    used = 0
+    for count in reversed(_count_tokens(lines)):
+        if used + count > budget:
+            break
+        used += count
+        kept += 1
+    if kept == len(lines):
+        return history_text
+    elided = len(lines) - kept
+    return "\n".join([f"[{elided} older messages elided]"] + lines[len(lines) - kept:])
+
+
+_TOOL_EXECUTOR_WORKERS = 8
+_tool_executor: Optional[ThreadPoolExecutor] = None
+_tool_executor_lock = threading.Lock()
+
+
+def _get_tool_executor() -> ThreadPoolExecutor:
+    """Return the shared executor used to run independent tool calls concurrently."""
+    global _tool_executor
+    if _tool_executor is None:
+        with _tool_executor_lock:
+            if _tool_executor is None:
+                _tool_executor = ThreadPoolExecutor(
+                    max_workers=_TOOL_EXECUTOR_WORKERS,
+                    thread_name_prefix="tracebrain-librarian",
+                )
+    return _tool_executor
+
+
 class LibrarianAgent:
     """Text-to-SQL agent with conversational memory and self-correction."""
 
+    __slots__ = (
+        "store",
+        "tools",
+        "_resp_cache",
+        "_resp_cache_lock",
+        "_fail_stats",
+        "_fail_stats_lock",
+        "_sql_cache",
+        "_sql_cache_lock",
+    )
+
     def __init__(self, store):
         self.store = store
-        self.tools = _build_tool_specs()
-
-    def _system_prompt(self) -> str:
-        return (
-            "You are the TraceBrain AI Librarian, an expert in Agent Operations (AgentOps). "
-            "Your task is to analyze agent execution traces to help human experts diagnose issues.\n\n"
-            "NEVER show raw SQL queries or technical tool outputs to the end-user in the 'answer' field. "
-            "Your final response MUST ALWAYS be a valid JSON object with 'answer', 'suggestions', and 'sources' keys. "
-            "The 'answer' should be a natural language summary of what you found in the database.\n\n"
-            
-            "### CORE TOOLS:\n"
-            "1. run_sql_query: Use this for counts, status filters, time-based queries, and metadata analysis.\n"
-            "2. search_similar_traces: Use this ONLY when the user asks for 'similar' cases or semantic patterns in reasoning/thoughts.\n\n"
-            
-            "### CRITICAL SQL RULES:\n"
-            "- All timestamps are in UTC. Use 'now() - interval X hours' for relative time queries.\n"
-            "- To see agent thoughts or tool outputs, you MUST JOIN 'traces' and 'spans' on 'spans.trace_id = traces.id'.\n"
-            "- For JSONB fields, use '->>' to get values as text (e.g., attributes->>'tracebrain.tool.name').\n"
-            "- Only perform SELECT queries. If the database returns EMPTY_RESULT, do not guess; explain that no data matches the criteria.\n\n"
-            
-            "### OUTPUT FORMAT (Strict JSON):\n"
-            "{"
-            "\"answer\": \"A concise summary of findings. Mention specific errors or patterns found.\", "
-            "\"suggestions\": [{\"label\": \"Follow-up question\", \"value\": \"Exact query text\"}], "
-            "\"sources\": [\"list of trace_ids discovered\"]"
-            "}\n\n"
-            f"{SCHEMA_CONTEXT}"
+        self.tools = _TOOL_SPECS
+        self._resp_cache: Optional[TTLCache] = (
+            TTLCache(maxsize=1024, ttl=settings.LIBRARIAN_CACHE_TTL)
+            if settings.LIBRARIAN_CACHE_TTL > 0
+            else None
         )
-
-    def _format_history(self, history: List[Dict[str, Any]]) -> str:
-        if not history:
-            return "None"
-        lines = []
-        for item in history:
-            role = item.get("role", "user")
-            content = item.get("content", "")
-            lines.append(f"{role}: {content}")
-        return "\n".join(lines)
+        self._resp_cache_lock = threading.Lock()
+        # session_id -> outcomes of recent SQL attempts (True = failed).
+        self._fail_stats: LRUCache = LRUCache(maxsize=1024)
+        self._fail_stats_lock = threading.Lock()
+        # (store write generation, canonical SQL) -> tool result string; failures
+        # are never cached.
+        self._sql_cache: TTLCache = TTLCache(maxsize=_SQL_CACHE_SIZE, ttl=_SQL_CACHE_TTL)
+        self._sql_cache_lock = threading.Lock()
+
+    def _cache_key(
+        self, history_text: str, user_query: str, model_id: Optional[str]
+    ) -> Tuple[int, str, str, str]:
+        # The store write generation keeps answers from outliving the traces they describe.
+        history_hash = hashlib.blake2b(history_text.encode("utf-8"), digest_size=16).hexdigest()
+        return self.store.write_generation, history_hash, user_query.strip(), model_id or ""
+
+    def _cache_get(self, key: Tuple[int, str, str, str]) -> Optional[Dict[str, Any]]:
+        if self._resp_cache is None:
+            return None
+        with self._resp_cache_lock:
+            return self._resp_cache.get(key)
+
+    def _cache_put(self, key: Tuple[int, str, str, str], result: Dict[str, Any]) -> None:
+        if self._resp_cache is None:
+            return
+        with self._resp_cache_lock:
+            self._resp_cache[key] = copy.deepcopy(result)
+
+    def _max_sql_attempts(self, session_id: str) -> int:
+        """Allow a single SQL attempt for sessions whose recent attempts mostly failed."""
+        with self._fail_stats_lock:
+            outcomes = self._fail_stats.get(session_id)
+            failures = sum(outcomes) if outcomes else 0
+        return 1 if failures > _SQL_FAILURE_THRESHOLD else _MAX_SQL_ATTEMPTS
+
+    def _record_sql_attempt(self, session_id: str, failed: bool) -> None:
+        with self._fail_stats_lock:
+            outcomes = self._fail_stats.get(session_id)
+            if outcomes is None:
+                outcomes = deque(maxlen=_SQL_OUTCOME_WINDOW)
+                self._fail_stats[session_id] = outcomes
+            outcomes.append(failed)
 
     def _extract_json(self, text: str) -> Dict[str, Any]:
         if not text:
             raise ValueError("Empty response from LLM")
 
+        # Well-prompted replies are bare JSON; parse them without any cleanup.
+        try:
+            return orjson.loads(text)
+        except orjson.JSONDecodeError:
+            pass
+
         cleaned = text.strip()
         if cleaned.startswith("```"):
-            cleaned = re.sub(r"^```(json)?", "", cleaned, flags=re.IGNORECASE).strip()
+            cleaned = _FENCE_RE.sub("", cleaned, 1).strip()
             if cleaned.endswith("```"):
                 cleaned = cleaned[:-3].strip()
 
         try:
-            return json.loads(cleaned)
-        except json.JSONDecodeError:
-            match = re.search(r"\{.*\}", cleaned, flags=re.DOTALL)
+            return orjson.loads(cleaned)
+        except orjson.JSONDecodeError:
+            match = _JSON_OBJ_RE.search(cleaned)
             if not match:
                 raise
-            return json.loads(match.group(0))
+            return orjson.loads(match.group(0))
 
     def _extract_sources(self, answer: str) -> Optional[List[str]]:
-        potential_ids = re.findall(r"[a-f0-9]{32}", answer)
-        return list(set(potential_ids)) if potential_ids else None
+        seen: Dict[str, None] = {}
+        for match in _HEX32_RE.finditer(answer):
+            seen[match.group(0)] = None
+            if len(seen) >= _MAX_EXTRACTED_SOURCES:
+                break
+        return list(seen) if seen else None
 
     def run_sql_query(self, sql_query: str) -> str:
         """Executes a READ-ONLY SQL query on the TraceStore."""
+        cache_key = (self.store.write_generation, _canonical_sql(sql_query))
+        with self._sql_cache_lock:
+            cached = self._sql_cache.get(cache_key)
+        if cached is not None:
+            return cached
+
         response = self.store.execute_read_only_sql(sql_query)
 
         if "error" in response:
             return f"EXECUTION_FAILED: {response['error']}"
 
         if response.get("count", 0) == 0:
-            return "EMPTY_RESULT: No data found for this query."
+            result = "EMPTY_RESULT: No data found for this query."
+        else:
+            result = self._serialize_rows(response.get("rows", []))
+        with self._sql_cache_lock:
+            self._sql_cache[cache_key] = result
+        return result
 
-        return json.dumps(response.get("rows", []), default=str)
+    def _serialize_rows(
+        self,
+        rows: List[Dict[str, Any]],
+        max_rows: int = _MAX_RESULT_ROWS,
+        max_bytes: int = _MAX_RESULT_BYTES,
+    ) -> str:
+        """Serialize rows as a JSON list, truncating to the row and byte budget."""
+        parts: List[bytes] = []
+        size = 2
+        for row in rows[:max_rows]:
+            encoded = orjson.dumps(row, default=str, option=_ORJSON_OPTIONS)
+            if parts and size + len(encoded) + 1 > max_bytes:
+                break
+            parts.append(encoded)
+            size += len(encoded) + 1
+        omitted = len(rows) - len(parts)
+        if omitted:
+            parts.append(orjson.dumps(f"...<{omitted} more rows truncated>"))
+        return (b"[" + b",".join(parts) + b"]").decode()
 
     def _abstain_response(self) -> Dict[str, Any]:
         return {
@@ -208,27 +557,63 @@ class LibrarianAgent:
             "sources": [],
         }
 
-    def _abstain_response_from_llm(self, user_query: str, history_text: str, provider: BaseProvider) -> Dict[str, Any]:
-        system_prompt = (
-            "You are the TraceBrain AI Librarian expert. The database returned EMPTY_RESULT for the user's request.\n\n"
-            "### YOUR TASK:\n"
-            "1. Analyze the User Question and explain politely that no traces currently match those specific criteria.\n"
-            "2. Identify potential reasons for the empty result (e.g., a time range that is too narrow, a specific error code that hasn't occurred, or a tool name typo).\n"
-            "3. Provide 3-4 ACTIONABLE suggestions to help the user find what they need. These should be formatted as direct questions or commands the user can click.\n\n"
-            "### SUGGESTION GUIDELINES:\n"
-            "- 'Broaden Time': Suggest looking back further (e.g., last 7 days).\n"
-            "- 'Relax Filters': If they asked for errors, suggest looking for all traces of that tool.\n"
-            "- 'Semantic Search': Suggest using natural language to find 'similar behavior' instead of exact SQL matches.\n\n"
-            "### OUTPUT RULES:\n"
-            "Return ONLY a strict JSON object:\n"
-            "{\n"
-            "  \"answer\": \"A professional explanation of why no data was found and what might be the cause.\",\n"
-            "  \"suggestions\": [\n"
-            "    {\"label\": \"Short label for UI button\", \"value\": \"The full natural language query to try next\"}\n"
-            "  ],\n"
-            "  \"sources\": []\n"
-            "}"
+    def _answer_from_sql_result(
+        self, provider: BaseProvider, session: Any, tool_result: str
+    ) -> Dict[str, Any]:
+        """Ask the model to summarize SQL results as an answer/suggestions/sources dict."""
+        prompt = (
+            "Here are the SQL results (JSON). Provide a JSON answer with keys "
+            "answer, suggestions, sources:\n"
+            f"{tool_result}"
         )
+        response = provider.send_user_message(session, prompt)
+        answer_text = provider.extract_text(response)
+        try:
+            parsed = self._extract_json(answer_text)
+        except Exception:
+            parsed = {"answer": answer_text, "suggestions": [], "sources": None}
+
+        answer = str(parsed.get("answer", "")).strip() or "No response."
+        suggestions = self._normalize_suggestions(parsed.get("suggestions"))
+        sources = self._normalize_sources(parsed.get("sources"), answer)
+        return {"answer": answer, "suggestions": suggestions, "sources": sources}
+
+    def _one_shot_sql(
+        self,
+        provider: BaseProvider,
+        system_prompt: str,
+        prompt_cache_key: str,
+        history_text: str,
+        user_query: str,
+        pending: List[Tuple[str, Any]],
+    ) -> Optional[Dict[str, Any]]:
+        """Answer with a single synthesized SQL query, skipping the tool planner.
+
+        Returns None when no SQL was produced or it failed or matched nothing,
+        so the caller can fall back to the tool-calling loop. The executed query
+        is recorded in pending as a tool turn either way.
+        """
+        session = provider.start_chat(system_prompt, [], cache_key=prompt_cache_key)
+        response = provider.send_user_message(
+            session,
+            (
+                "Conversation History:\n"
+                f"{history_text}\n\n"
+                "User Question:\n"
+                f"{user_query}\n\n"
+                "Return JSON only, with a single key 'sql' holding one SELECT query."
+            ),
+        )
+        sql_query = self._extract_sql(provider.extract_text(response))
+        if not sql_query:
+            return None
+        tool_result = self.run_sql_query(sql_query)
+        pending.append((_ROLE_TOOL, f"SQL: {sql_query}\nRESULT: {tool_result}"))
+        if tool_result.startswith(("EXECUTION_FAILED", "EMPTY_RESULT")):
+            return None
+        return self._answer_from_sql_result(provider, session, tool_result)
+
+    def _abstain_response_from_llm(self, user_query: str, history_text: str, provider: BaseProvider) -> Dict[str, Any]:
         user_content = (
             "Conversation History:\n"
             f"{history_text}\n\n"
@@ -237,7 +622,9 @@ class LibrarianAgent:
             "Return JSON only."
         )
         try:
-            session = provider.start_chat(system_prompt, [])
+            session = provider.start_chat(
+                _ABSTAIN_SYSTEM_PROMPT, [], cache_key=_ABSTAIN_PROMPT_CACHE_KEY
+            )
             response = provider.send_user_message(session, user_content)
             answer_text = provider.extract_text(response)
             parsed = self._extract_json(answer_text)
@@ -258,8 +645,14 @@ class LibrarianAgent:
         for item in suggestions:
             if not isinstance(item, dict):
                 continue
-            label = str(item.get("label", "")).strip()
-            value = str(item.get("value", "")).strip()
+            label = item.get("label", "")
+            value = item.get("value", "")
+            if not isinstance(label, str):
+                label = str(label)
+            if not isinstance(value, str):
+                value = str(value)
+            label = label.strip()
+            value = value.strip()
             if label and value:
                 normalized.append({"label": label, "value": value})
         return normalized
@@ -268,7 +661,7 @@ class LibrarianAgent:
         if isinstance(sources, list):
             cleaned = []
             for item in sources:
-                value = str(item).strip()
+                value = (item if isinstance(item, str) else str(item)).strip()
                 if value:
                     cleaned.append(value)
             return list(dict.fromkeys(cleaned))
@@ -276,29 +669,70 @@ class LibrarianAgent:
         return extracted if extracted else []
 
     def _extract_sql(self, text: str) -> Optional[str]:
-        if not text:
+        # Every statement we accept contains SELECT; skip all parsing otherwise.
+        if not text or "select" not in text.lower():
             return None
-        try:
-            parsed = self._extract_json(text)
-            sql = parsed.get("sql") or parsed.get("query")
-            if sql:
-                return str(sql).strip()
-        except Exception:
-            pass
-        match = re.search(r"```(?:sql)?\s*(.*?)```", text, flags=re.IGNORECASE | re.DOTALL)
+        if "{" in text:
+            try:
+                parsed = self._extract_json(text)
+                sql = parsed.get("sql") or parsed.get("query")
+                if sql:
+                    return str(sql).strip()
+            except Exception:
+                pass
+        match = _SQL_FENCE_RE.search(text)
         candidate = match.group(1).strip() if match else text
 
-        statements = sqlparse.parse(candidate)
-        for statement in statements:
-            if statement.get_type() == "SELECT":
-                return str(statement).strip()
-
-        fallback = re.search(r"SELECT\s+.*", candidate, flags=re.IGNORECASE | re.DOTALL)
+        # Single SELECT statements are recognised without tokenizing; a parser is
+        # only needed to pick the SELECT out of multi-statement output.
+        if ";" not in candidate.strip().rstrip(";"):
+            if _SELECT_ONLY_RE.match(candidate):
+                return candidate.strip()
+        else:
+            statement = _first_select_statement(candidate)
+            if statement:
+                return statement
+
+        fallback = _SELECT_RE.search(candidate)
         return fallback.group(0).strip() if fallback else None
 
     def search_similar_traces(self, query: str, min_rating: int = 4, limit: int = 3) -> str:
         results = self.store.search_similar_experiences(query, min_rating=min_rating, limit=limit)
-        return json.dumps(results, default=str)
+        return orjson.dumps(results, default=str, option=_ORJSON_OPTIONS).decode()
+
+    def _run_tool(self, call: Dict[str, Any]) -> str:
+        tool_name = call.get("name")
+        args = call.get("args") or {}
+        if tool_name == _TOOL_SQL:
+            return self.run_sql_query(args.get("query", ""))
+        if tool_name == _TOOL_SEARCH:
+            return self.search_similar_traces(
+                args.get("query", ""),
+                min_rating=int(args.get("min_rating", 4)),
+                limit=int(args.get("limit", 3)),
+            )
+        return "UNKNOWN_TOOL"
+
+    def _run_tool_calls(self, tool_calls: List[Dict[str, Any]]) -> List[str]:
+        """Execute a turn's tool calls, in parallel when there is more than one.
+
+        Results are collected in call order. When a call raises, calls that have
+        not started yet are cancelled and the error propagates; calls already
+        running are read-only and are left to finish.
+        """
+        if len(tool_calls) < 2:
+            return [self._run_tool(call) for call in tool_calls]
+        executor = _get_tool_executor()
+        futures = [executor.submit(self._run_tool, call) for call in tool_calls]
+        results: List[str] = []
+        try:
+            for future in futures:
+                results.append(future.result())
+        except BaseException:
+            for future in futures:
+                future.cancel()
+            raise
+        return results
 
     def query(self, user_query: str, session_id: str, model_id: Optional[str] = None) -> Dict[str, Any]:
         """Process a natural language query using the configured provider.
@@ -308,6 +742,21 @@ class LibrarianAgent:
             session_id: Conversation session ID for context
             model_id: Optional model override (e.g., 'gpt-4o', 'gemini-2.0-flash-exp')
         """
+        pending: List[Tuple[str, Any]] = []
+        try:
+            return self._answer_query(user_query, session_id, model_id, pending)
+        finally:
+            # Persist the whole turn (user, tool and assistant messages) in one write.
+            if pending:
+                self.store.save_chat_messages(session_id, pending)
+
+    def _answer_query(
+        self,
+        user_query: str,
+        session_id: str,
+        model_id: Optional[str],
+        pending: List[Tuple[str, Any]],
+    ) -> Dict[str, Any]:
         if not LIBRARIAN_AVAILABLE:
             return {
                 "answer": "Librarian is not available. Check provider configuration and API keys.",
@@ -315,15 +764,25 @@ class LibrarianAgent:
                 "sources": [],
             }
 
-        # Select provider with optional model override
-        provider = select_provider(model_override=model_id)
+        history_text = _truncate_history(self.store.get_rendered_history(session_id)) or "None"
+
+        # Identical question in an identical conversation: replay the cached answer.
+        cache_key = self._cache_key(history_text, user_query, model_id)
+        cached = self._cache_get(cache_key)
+        if cached is not None:
+            pending.append((_ROLE_USER, user_query))
+            pending.append((_ROLE_ASSIST, cached))
+            return copy.deepcopy(cached)
 
-        history = self.store.get_chat_history(session_id)
-        history_text = self._format_history(history)
+        # Select provider with optional model override
+        provider = get_provider(model_override=model_id)
 
-        self.store.save_chat_message(session_id, "user", user_query)
+        pending.append((_ROLE_USER, user_query))
+        sql_failed = False
 
-        system_prompt = self._system_prompt()
+        system_prompt, prompt_cache_key = _system_prompt_for(f"{history_text}\n{user_query}")
+        # Static text first, then append-only history, then the new question, so
+        # consecutive turns share the longest possible prompt prefix.
         user_content = (
             "Conversation History:\n"
             f"{history_text}\n\n"
@@ -337,21 +796,26 @@ class LibrarianAgent:
         logger.debug("Librarian using provider: %s (model: %s)", provider.name, getattr(provider, 'model', getattr(provider, 'model_name', 'unknown')))
 
         if not provider.supports_tools:
-            session = provider.start_chat(system_prompt, [])
+            session = provider.start_chat(system_prompt, [], cache_key=prompt_cache_key)
             prompt = (
                 user_content
                 + "\n\nProvide a SQL SELECT query only (or JSON with key 'sql')."
             )
-            for _ in range(3):
+            for _ in range(self._max_sql_attempts(session_id)):
                 response = provider.send_user_message(session, prompt)
                 text = provider.extract_text(response)
                 sql_query = self._extract_sql(text)
                 if not sql_query:
+                    self._record_sql_attempt(session_id, failed=True)
                     prompt = "Failed to parse SQL. Please output a single SELECT query."
                     continue
 
                 tool_result = self.run_sql_query(sql_query)
+                self._record_sql_attempt(
+                    session_id, failed=tool_result.startswith("EXECUTION_FAILED")
+                )
                 if tool_result.startswith("EXECUTION_FAILED"):
+                    sql_failed = True
                     prompt = (
                         "SQL execution failed. Here is the database error message. "
                         "Fix the SQL and output a new SELECT query only.\n"
@@ -360,33 +824,33 @@ class LibrarianAgent:
                     continue
                 if tool_result.startswith("EMPTY_RESULT"):
                     result = self._abstain_response_from_llm(user_query, history_text, provider)
-                    self.store.save_chat_message(session_id, "assistant", result)
+                    pending.append((_ROLE_ASSIST, result))
+                    if not sql_failed:
+                        self._cache_put(cache_key, result)
                     return result
 
-                prompt = (
-                    "Here are the SQL results (JSON). Provide a JSON answer with keys "
-                    "answer, suggestions, sources:\n"
-                    f"{tool_result}"
-                )
-                response = provider.send_user_message(session, prompt)
-                answer_text = provider.extract_text(response)
-                try:
-                    parsed = self._extract_json(answer_text)
-                except Exception:
-                    parsed = {"answer": answer_text, "suggestions": [], "sources": None}
-
-                answer = str(parsed.get("answer", "")).strip() or "No response."
-                suggestions = self._normalize_suggestions(parsed.get("suggestions"))
-                sources = self._normalize_sources(parsed.get("sources"), answer)
-                result = {"answer": answer, "suggestions": suggestions, "sources": sources}
-                self.store.save_chat_message(session_id, "assistant", result)
+                result = self._answer_from_sql_result(provider, session, tool_result)
+                pending.append((_ROLE_ASSIST, result))
+                if not sql_failed:
+                    self._cache_put(cache_key, result)
                 return result
 
             fallback = "Unable to generate a valid SQL query. Please refine the question."
-            self.store.save_chat_message(session_id, "assistant", {"answer": fallback})
+            pending.append((_ROLE_ASSIST, {"answer": fallback}))
             return {"answer": fallback, "suggestions": [], "sources": []}
 
-        session = provider.start_chat(system_prompt, self.tools)
+        if _TABULAR_QUESTION_RE.search(user_query) and not _SEMANTIC_QUESTION_RE.search(user_query):
+            result = self._one_shot_sql(
+                provider, system_prompt, prompt_cache_key, history_text, user_query, pending
+            )
+            if result is not None:
+                pending.append((_ROLE_ASSIST, result))
+                self._cache_put(cache_key, result)
+                return result
+
+        session = provider.start_chat(
+            system_prompt, self.tools, cache_key=prompt_cache_key
+        )
         response = provider.send_user_message(session, user_content)
         last_sql_result: Optional[str] = None
         saw_sql_result = False
@@ -396,32 +860,22 @@ class LibrarianAgent:
             if not tool_calls:
                 break
 
-            for call in tool_calls:
+            tool_results = self._run_tool_calls(tool_calls)
+            for call, tool_result in zip(tool_calls, tool_results):
                 tool_name = call.get("name")
                 args = call.get("args") or {}
-                if tool_name == "run_sql_query":
+                if tool_name == _TOOL_SQL:
                     sql_query = args.get("query", "")
-                    tool_result = self.run_sql_query(sql_query)
-                    if not tool_result.startswith("EXECUTION_FAILED") and not tool_result.startswith("EMPTY_RESULT"):
+                    if tool_result.startswith("EXECUTION_FAILED"):
+                        sql_failed = True
+                    elif not tool_result.startswith("EMPTY_RESULT"):
                         last_sql_result = tool_result
                         saw_sql_result = True
-                    self.store.save_chat_message(
-                        session_id,
-                        "tool",
-                        f"SQL: {sql_query}\nRESULT: {tool_result}",
-                    )
-                elif tool_name == "search_similar_traces":
-                    query = args.get("query", "")
-                    min_rating = int(args.get("min_rating", 4))
-                    limit = int(args.get("limit", 3))
-                    tool_result = self.search_similar_traces(query, min_rating=min_rating, limit=limit)
-                    self.store.save_chat_message(
-                        session_id,
-                        "tool",
-                        f"SEARCH: {query}\nRESULT: {tool_result}",
+                    pending.append((_ROLE_TOOL, f"SQL: {sql_query}\nRESULT: {tool_result}"))
+                elif tool_name == _TOOL_SEARCH:
+                    pending.append(
+                        (_ROLE_TOOL, f"SEARCH: {args.get('query', '')}\nRESULT: {tool_result}")
                     )
-                else:
-                    tool_result = "UNKNOWN_TOOL"
 
                 response = provider.send_tool_result(
                     session,
@@ -430,7 +884,7 @@ class LibrarianAgent:
                     tool_call_id=call.get("id"),
                 )
 
-                if tool_name == "run_sql_query" and tool_result.startswith("EXECUTION_FAILED"):
+                if tool_name == _TOOL_SQL and tool_result.startswith("EXECUTION_FAILED"):
                     response = provider.send_user_message(
                         session,
                         (
@@ -440,9 +894,11 @@ class LibrarianAgent:
                         ),
                     )
                     break
-                if tool_name == "run_sql_query" and tool_result.startswith("EMPTY_RESULT"):
+                if tool_name == _TOOL_SQL and tool_result.startswith("EMPTY_RESULT"):
                     result = self._abstain_response_from_llm(user_query, history_text, provider)
-                    self.store.save_chat_message(session_id, "assistant", result)
+                    pending.append((_ROLE_ASSIST, result))
+                    if not sql_failed:
+                        self._cache_put(cache_key, result)
                     return result
 
         if saw_sql_result and last_sql_result:
@@ -482,5 +938,7 @@ class LibrarianAgent:
             "sources": sources,
         }
 
-        self.store.save_chat_message(session_id, "assistant", result)
+        pending.append((_ROLE_ASSIST, result))
+        if not sql_failed:
+            self._cache_put(cache_key, result)
         return result
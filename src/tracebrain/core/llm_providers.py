@@ -2,7 +2,8 @@
 
 from __future__ import annotations
 
-from typing import Dict, List, Optional, Any
+from typing import Dict, Iterator, List, Optional, Any
+import functools
 import logging
 import json
 
@@ -26,12 +27,29 @@ class BaseProvider:
         self.temperature = settings.LLM_TEMPERATURE
         self.max_tokens = settings.LLM_MAX_TOKENS
 
-    def start_chat(self, system_instruction: str, tools: List[Dict[str, Any]]):
+    def start_chat(
+        self,
+        system_instruction: str,
+        tools: List[Dict[str, Any]],
+        cache_key: Optional[str] = None,
+    ):
+        """Create a chat session.
+
+        ``cache_key`` identifies a stable system prompt so providers that support
+        prompt caching can reuse the prefix across sessions; others ignore it.
+        """
         raise NotImplementedError
 
     def send_user_message(self, session, content: str):
         raise NotImplementedError
 
+    def stream_user_message(self, session, content: str) -> Iterator[str]:
+        """Yield response text chunks as they arrive.
+
+        Providers without a streaming API yield the full reply as one chunk.
+        """
+        yield self.extract_text(self.send_user_message(session, content))
+
     def send_tool_result(self, session, tool_name: str, tool_result: str, tool_call_id: Optional[str]):
         raise NotImplementedError
 
@@ -45,6 +63,7 @@ class BaseProvider:
 class OpenAIProvider(BaseProvider):
     name = "openai"
     supports_tools = True
+    supports_prompt_cache_key = True
 
     def __init__(self, api_key: Optional[str], model: str, base_url: Optional[str] = None):
         super().__init__()
@@ -54,25 +73,64 @@ class OpenAIProvider(BaseProvider):
             raise ProviderError("openai SDK not available") from exc
         self.client = OpenAI(api_key=api_key, base_url=base_url)
         self.model = model
-
-    def start_chat(self, system_instruction: str, tools: List[Dict[str, Any]]):
+        # OpenAI-compatible servers may reject unknown request fields.
+        self.supports_prompt_cache_key = base_url is None
+
+    def start_chat(
+        self,
+        system_instruction: str,
+        tools: List[Dict[str, Any]],
+        cache_key: Optional[str] = None,
+    ):
         messages = [{"role": "system", "content": system_instruction}]
-        return {"messages": messages, "tools": tools}
+        # Built once per chat so every request in it sends byte-identical tool specs.
+        session: Dict[str, Any] = {
+            "messages": messages,
+            "tools": [{"type": "function", "function": tool} for tool in tools],
+        }
+        if cache_key and self.supports_prompt_cache_key:
+            session["prompt_cache_key"] = cache_key
+        return session
+
+    def _extra_body(self, session) -> Optional[Dict[str, Any]]:
+        cache_key = session.get("prompt_cache_key")
+        return {"prompt_cache_key": cache_key} if cache_key else None
 
     def send_user_message(self, session, content: str):
         session["messages"].append({"role": "user", "content": content})
         response = self.client.chat.completions.create(
             model=self.model,
             messages=session["messages"],
-            tools=[{"type": "function", "function": tool} for tool in session.get("tools", [])],
+            tools=session.get("tools", []),
             tool_choice="auto" if session.get("tools") else None,
             temperature=self.temperature,
             max_tokens=self.max_tokens,
+            extra_body=self._extra_body(session),
         )
         message = response.choices[0].message
         session["messages"].append(message.model_dump())
         return response
 
+    def stream_user_message(self, session, content: str) -> Iterator[str]:
+        session["messages"].append({"role": "user", "content": content})
+        stream = self.client.chat.completions.create(
+            model=self.model,
+            messages=session["messages"],
+            temperature=self.temperature,
+            max_tokens=self.max_tokens,
+            stream=True,
+            extra_body=self._extra_body(session),
+        )
+        parts: List[str] = []
+        for chunk in stream:
+            if not chunk.choices:
+                continue
+            delta = chunk.choices[0].delta.content
+            if delta:
+                parts.append(delta)
+                yield delta
+        session["messages"].append({"role": "assistant", "content": "".join(parts)})
+
     def send_tool_result(self, session, tool_name: str, tool_result: str, tool_call_id: Optional[str]):
         tool_message = {
             "role": "tool",
@@ -85,10 +143,11 @@ class OpenAIProvider(BaseProvider):
         response = self.client.chat.completions.create(
             model=self.model,
             messages=session["messages"],
-            tools=[{"type": "function", "function": tool} for tool in session.get("tools", [])],
+            tools=session.get("tools", []),
             tool_choice="auto" if session.get("tools") else None,
             temperature=self.temperature,
             max_tokens=self.max_tokens,
+            extra_body=self._extra_body(session),
         )
         message = response.choices[0].message
         session["messages"].append(message.model_dump())
@@ -119,6 +178,7 @@ class OpenAIProvider(BaseProvider):
 
 class AzureOpenAIProvider(OpenAIProvider):
     name = "azure_openai"
+    supports_prompt_cache_key = False
 
     def __init__(self, api_key: Optional[str], model: str, base_url: str, api_version: str):
         try:
@@ -146,8 +206,31 @@ class AnthropicProvider(BaseProvider):
         self.client = Anthropic(api_key=api_key, base_url=base_url)
         self.model = model
 
-    def start_chat(self, system_instruction: str, tools: List[Dict[str, Any]]):
-        return {"system": system_instruction, "messages": [], "tools": tools}
+    def start_chat(
+        self,
+        system_instruction: str,
+        tools: List[Dict[str, Any]],
+        cache_key: Optional[str] = None,
+    ):
+        system: Any = system_instruction
+        if cache_key:
+            system = [
+                {
+                    "type": "text",
+                    "text": system_instruction,
+                    "cache_control": {"type": "ephemeral"},
+                }
+            ]
+        # Built once per chat so every request in it sends byte-identical tool specs.
+        tool_payload = [
+            {
+                "name": tool["name"],
+                "description": tool.get("description"),
+                "input_schema": tool.get("parameters") or {"type": "object", "properties": {}},
+            }
+            for tool in tools
+        ]
+        return {"system": system, "messages": [], "tools": tool_payload}
 
     def send_user_message(self, session, content: str):
         session["messages"].append({"role": "user", "content": content})
@@ -155,19 +238,27 @@ class AnthropicProvider(BaseProvider):
             model=self.model,
             system=session["system"],
             messages=session["messages"],
-            tools=[
-                {
-                    "name": tool["name"],
-                    "description": tool.get("description"),
-                    "input_schema": tool.get("parameters") or {"type": "object", "properties": {}},
-                }
-                for tool in session.get("tools", [])
-            ],
+            tools=session.get("tools", []),
             temperature=self.temperature,
             max_tokens=self.max_tokens or 512,
         )
         return response
 
+    def stream_user_message(self, session, content: str) -> Iterator[str]:
+        session["messages"].append({"role": "user", "content": content})
+        with self.client.messages.stream(
+            model=self.model,
+            system=session["system"],
+            messages=session["messages"],
+            temperature=self.temperature,
+            max_tokens=self.max_tokens or 512,
+        ) as stream:
+            parts: List[str] = []
+            for text in stream.text_stream:
+                parts.append(text)
+                yield text
+        session["messages"].append({"role": "assistant", "content": "".join(parts)})
+
     def send_tool_result(self, session, tool_name: str, tool_result: str, tool_call_id: Optional[str]):
         session["messages"].append(
             {
@@ -185,14 +276,7 @@ class AnthropicProvider(BaseProvider):
             model=self.model,
             system=session["system"],
             messages=session["messages"],
-            tools=[
-                {
-                    "name": tool["name"],
-                    "description": tool.get("description"),
-                    "input_schema": tool.get("parameters") or {"type": "object", "properties": {}},
-                }
-                for tool in session.get("tools", [])
-            ],
+            tools=session.get("tools", []),
             temperature=self.temperature,
             max_tokens=self.max_tokens or 512,
         )
@@ -226,8 +310,14 @@ class OllamaProvider(BaseProvider):
         super().__init__()
         self.base_url = (base_url or "http://localhost:11434").rstrip("/")
         self.model = model
-
-    def start_chat(self, system_instruction: str, tools: List[Dict[str, Any]]):
+        self.http = requests.Session()
+
+    def start_chat(
+        self,
+        system_instruction: str,
+        tools: List[Dict[str, Any]],
+        cache_key: Optional[str] = None,
+    ):
         messages = [{"role": "system", "content": system_instruction}]
         return {"messages": messages}
 
@@ -239,7 +329,7 @@ class OllamaProvider(BaseProvider):
             "stream": False,
             "options": {"temperature": self.temperature},
         }
-        response = requests.post(
+        response = self.http.post(
             f"{self.base_url}/api/chat", json=payload, timeout=self.timeout
         )
         if response.status_code >= 400:
@@ -249,6 +339,32 @@ class OllamaProvider(BaseProvider):
         session["messages"].append(message)
         return data
 
+    def stream_user_message(self, session, content: str) -> Iterator[str]:
+        session["messages"].append({"role": "user", "content": content})
+        payload: Dict[str, Any] = {
+            "model": self.model,
+            "messages": session["messages"],
+            "stream": True,
+            "options": {"temperature": self.temperature},
+        }
+        parts: List[str] = []
+        with self.http.post(
+            f"{self.base_url}/api/chat", json=payload, timeout=self.timeout, stream=True
+        ) as response:
+            if response.status_code >= 400:
+                raise ProviderError(f"Provider error {response.status_code}: {response.text[:200]}")
+            for line in response.iter_lines():
+                if not line:
+                    continue
+                data = json.loads(line)
+                delta = (data.get("message") or {}).get("content") or ""
+                if delta:
+                    parts.append(delta)
+                    yield delta
+                if data.get("done"):
+                    break
+        session["messages"].append({"role": "assistant", "content": "".join(parts)})
+
     def send_tool_result(self, session, tool_name: str, tool_result: str, tool_call_id: Optional[str]):
         raise ProviderError("Ollama provider does not support tool calling")
 
@@ -273,7 +389,12 @@ class GeminiProvider(BaseProvider):
         self.genai = genai
         self.model_name = model
 
-    def start_chat(self, system_instruction: str, tools: List[Dict[str, Any]]):
+    def start_chat(
+        self,
+        system_instruction: str,
+        tools: List[Dict[str, Any]],
+        cache_key: Optional[str] = None,
+    ):
         tool_decls = []
         for tool in tools:
             tool_decls.append(
@@ -306,6 +427,15 @@ class GeminiProvider(BaseProvider):
     def send_user_message(self, session, content: str):
         return session["chat"].send_message(content)
 
+    def stream_user_message(self, session, content: str) -> Iterator[str]:
+        for chunk in session["chat"].send_message(content, stream=True):
+            try:
+                text = chunk.text
+            except ValueError:
+                continue
+            if text:
+                yield text
+
     def send_tool_result(self, session, tool_name: str, tool_result: str, tool_call_id: Optional[str]):
         return session["chat"].send_message(
             self.genai.protos.Content(
@@ -349,8 +479,14 @@ class HuggingFaceProvider(BaseProvider):
         self.api_key = api_key
         self.model = model
         self.base_url = (base_url or "https://api-inference.huggingface.co").rstrip("/")
-
-    def start_chat(self, system_instruction: str, tools: List[Dict[str, Any]]):
+        self.http = requests.Session()
+
+    def start_chat(
+        self,
+        system_instruction: str,
+        tools: List[Dict[str, Any]],
+        cache_key: Optional[str] = None,
+    ):
         return {"system": system_instruction, "history": []}
 
     def _headers(self) -> Dict[str, str]:
@@ -377,7 +513,7 @@ class HuggingFaceProvider(BaseProvider):
             payload["parameters"]["max_new_tokens"] = self.max_tokens
 
         url = f"{self.base_url}/models/{self.model}"
-        response = requests.post(url, headers=self._headers(), json=payload, timeout=self.timeout)
+        response = self.http.post(url, headers=self._headers(), json=payload, timeout=self.timeout)
         if response.status_code >= 400:
             raise ProviderError(f"Provider error {response.status_code}: {response.text[:200]}")
 
@@ -439,6 +575,24 @@ def select_provider(
     raise ProviderError(f"Unsupported provider configuration: {mode} / {provider}")
 
 
+@functools.lru_cache(maxsize=8)
+def get_provider(
+    model_override: Optional[str] = None,
+    provider_override: Optional[str] = None,
+    mode_override: Optional[str] = None,
+) -> BaseProvider:
+    """Return a process-wide provider so its HTTP client and connections are reused.
+
+    Chat state lives in the session returned by ``start_chat``, so one provider
+    instance can serve concurrent conversations.
+    """
+    return select_provider(
+        model_override=model_override,
+        provider_override=provider_override,
+        mode_override=mode_override,
+    )
+
+
 def is_provider_available() -> bool:
     try:
         select_provider()
@@ -10,6 +10,7 @@ Usage:
     parsers, adapters, and the TraceStore.
 """
 
+from datetime import datetime, timezone
 from enum import Enum
 from typing import List, Dict, Any, Optional
 from pydantic import BaseModel, Field, ConfigDict
@@ -112,7 +113,9 @@ class Trace(BaseModel):
 
 # --- Helper Utilities ---
 
+_UTC = timezone.utc
+
 def get_iso_time_now() -> str:
     """Returns current time in ISO 8601 UTC format."""
-    from datetime import datetime, timezone
-    return datetime.now(timezone.utc).isoformat().replace('+00:00', 'Z')
\ No newline at end of file
+    now = datetime.now(_UTC)
+    return f"{now:%Y-%m-%dT%H:%M:%S}.{now.microsecond:06d}Z"
\ No newline at end of file
@@ -7,19 +7,92 @@ Provides a model-agnostic interface with a local-first default.
 from __future__ import annotations
 
 from abc import ABC, abstractmethod
-from typing import List
+from functools import lru_cache
+from pathlib import Path
+from typing import List, Optional, Sequence
+import hashlib
 import logging
+import re
+import threading
+
+from cachetools import LRUCache
 
 from tracebrain.config import settings
 
 logger = logging.getLogger(__name__)
 
 
+@lru_cache(maxsize=4)
+def _load_st_model(name: str, device: Optional[str]):
+    """Load a SentenceTransformer once per process for each model/device pair."""
+    from sentence_transformers import SentenceTransformer
+
+    return SentenceTransformer(name, device=device)
+
+
+# A float32 NumPy vector from local models, or a plain list from cloud APIs.
+# An empty embedding means the provider failed or is disabled.
+Embedding = Sequence[float]
+
+# Query embeddings memoized in process, and optionally on disk via EMBEDDING_CACHE_DIR.
+_EMBEDDING_CACHE_SIZE = 1024
+_embedding_cache: LRUCache = LRUCache(maxsize=_EMBEDDING_CACHE_SIZE)
+_embedding_cache_lock = threading.Lock()
+
+
+@lru_cache(maxsize=1)
+def _get_disk_cache():
+    """Return the shared diskcache.Cache, or None when disabled or not installed."""
+    if not settings.EMBEDDING_CACHE_DIR:
+        return None
+    try:
+        import diskcache
+    except ImportError:
+        logger.warning("EMBEDDING_CACHE_DIR is set but diskcache is not installed")
+        return None
+    return diskcache.Cache(settings.EMBEDDING_CACHE_DIR)
+
+
 class BaseEmbeddingProvider(ABC):
     @abstractmethod
-    def get_embedding(self, text: str) -> List[float]:
+    def get_embeddings(self, texts: List[str]) -> List[Embedding]:
+        """Embed texts in one batch; failed embeddings come back as empty lists."""
         raise NotImplementedError
 
+    def get_embedding(self, text: str) -> Embedding:
+        return self.get_embeddings([text])[0]
+
+    @property
+    def cache_namespace(self) -> Optional[str]:
+        """Identifies the model producing embeddings; None disables caching."""
+        return None
+
+    def get_cached_embedding(self, text: str) -> Embedding:
+        """Embed text, reusing a previous result for the same model and text."""
+        namespace = self.cache_namespace
+        if namespace is None:
+            return self.get_embedding(text)
+        digest = hashlib.blake2b(text.encode("utf-8"), digest_size=16).hexdigest()
+        key = f"{namespace}:{digest}"
+
+        with _embedding_cache_lock:
+            embedding = _embedding_cache.get(key)
+        if embedding is not None:
+            return embedding
+
+        disk_cache = _get_disk_cache()
+        if disk_cache is not None:
+            embedding = disk_cache.get(key)
+        if embedding is None:
+            embedding = self.get_embedding(text)
+            if len(embedding) == 0:
+                return embedding
+            if disk_cache is not None:
+                disk_cache.set(key, embedding)
+        with _embedding_cache_lock:
+            _embedding_cache[key] = embedding
+        return embedding
+
 
 class LocalEmbeddingProvider(BaseEmbeddingProvider):
     def __init__(self) -> None:
@@ -28,27 +101,122 @@ class LocalEmbeddingProvider(BaseEmbeddingProvider):
 
     def _load_model(self) -> None:
         try:
-            from sentence_transformers import SentenceTransformer
-
-            self._model = SentenceTransformer(settings.EMBEDDING_MODEL)
+            self._model = _load_st_model(settings.EMBEDDING_MODEL, settings.EMBEDDING_DEVICE)
         except Exception as exc:
             logger.warning("Failed to load local embedding model: %s", exc)
             self._model = None
 
-    def get_embedding(self, text: str) -> List[float]:
-        if not self._model:
-            return []
+    @property
+    def cache_namespace(self) -> Optional[str]:
+        return f"local:{settings.EMBEDDING_MODEL}"
+
+    def get_embeddings(self, texts: List[str]) -> List[Embedding]:
+        if not self._model or not texts:
+            return [[] for _ in texts]
         try:
-            embedding = self._model.encode([text], normalize_embeddings=True)
-            return embedding[0].tolist()
+            embeddings = self._model.encode(
+                texts,
+                batch_size=32,
+                normalize_embeddings=True,
+                convert_to_numpy=True,
+            )
+            # Row views of one contiguous float32 matrix; no per-float boxing.
+            return list(embeddings.astype("float32", copy=False))
         except Exception as exc:
             logger.warning("Embedding generation failed: %s", exc)
-            return []
+            return [[] for _ in texts]
+
+
+@lru_cache(maxsize=2)
+def _load_onnx_int8_model(name: str):
+    """Export name to ONNX, quantize it to dynamic int8 and load it with its tokenizer.
+
+    The quantized model is written under ~/.cache/tracebrain/onnx and reused on
+    later runs.
+    """
+    from optimum.onnxruntime import ORTModelForFeatureExtraction, ORTQuantizer
+    from optimum.onnxruntime.configuration import AutoQuantizationConfig
+    from transformers import AutoTokenizer
+
+    # sentence-transformers resolves bare model names under its own namespace.
+    repo_id = name if "/" in name else f"sentence-transformers/{name}"
+    save_dir = Path.home() / ".cache" / "tracebrain" / "onnx" / re.sub(r"[^\w.-]", "_", repo_id)
+    quantized_file = "model_quantized.onnx"
+
+    if not (save_dir / quantized_file).exists():
+        exported = ORTModelForFeatureExtraction.from_pretrained(repo_id, export=True)
+        quantizer = ORTQuantizer.from_pretrained(exported)
+        qconfig = AutoQuantizationConfig.avx512_vnni(is_static=False, per_channel=False)
+        quantizer.quantize(save_dir=save_dir, quantization_config=qconfig)
+        AutoTokenizer.from_pretrained(repo_id).save_pretrained(save_dir)
+
+    model = ORTModelForFeatureExtraction.from_pretrained(save_dir, file_name=quantized_file)
+    tokenizer = AutoTokenizer.from_pretrained(save_dir)
+    return model, tokenizer
+
+
+class OnnxEmbeddingProvider(BaseEmbeddingProvider):
+    """Local embeddings from an int8-quantized ONNX export of EMBEDDING_MODEL."""
+
+    def __init__(self) -> None:
+        self._model = None
+        self._tokenizer = None
+        self._load_model()
+
+    def _load_model(self) -> None:
+        try:
+            self._model, self._tokenizer = _load_onnx_int8_model(settings.EMBEDDING_MODEL)
+        except Exception as exc:
+            logger.warning("Failed to load ONNX embedding model: %s", exc)
+            self._model = None
+            self._tokenizer = None
+
+    @property
+    def cache_namespace(self) -> Optional[str]:
+        return f"onnx:{settings.EMBEDDING_MODEL}"
+
+    def get_embeddings(self, texts: List[str]) -> List[Embedding]:
+        if not self._model or not texts:
+            return [[] for _ in texts]
+        try:
+            import numpy as np
+
+            inputs = self._tokenizer(texts, padding=True, truncation=True, return_tensors="np")
+            hidden = self._model(**inputs).last_hidden_state
+            # Mean pooling over real tokens, then L2 normalization.
+            mask = inputs["attention_mask"][..., None].astype(hidden.dtype)
+            pooled = (hidden * mask).sum(axis=1) / np.clip(mask.sum(axis=1), 1e-9, None)
+            norms = np.linalg.norm(pooled, axis=1, keepdims=True)
+            normalized = pooled / np.clip(norms, 1e-12, None)
+            return list(normalized.astype(np.float32, copy=False))
+        except Exception as exc:
+            logger.warning("Embedding generation failed: %s", exc)
+            return [[] for _ in texts]
 
 
 class CloudEmbeddingProvider(BaseEmbeddingProvider):
     def __init__(self, provider: str) -> None:
         self.provider = provider.lower()
+        self._client = None
+        self._client_lock = threading.Lock()
+
+    def _openai_client(self):
+        """Return a lazily created OpenAI client whose connection pool is reused across calls."""
+        if self._client is None:
+            with self._client_lock:
+                if self._client is None:
+                    import httpx
+                    from openai import OpenAI
+
+                    self._client = OpenAI(
+                        api_key=settings.EMBEDDING_API_KEY,
+                        base_url=settings.EMBEDDING_BASE_URL,
+                        http_client=httpx.Client(
+                            timeout=httpx.Timeout(60.0, connect=5.0),
+                            limits=httpx.Limits(max_keepalive_connections=16),
+                        ),
+                    )
+        return self._client
 
     def _resolve_model(self) -> str:
         if self.provider == "openai":
@@ -59,61 +227,78 @@ class CloudEmbeddingProvider(BaseEmbeddingProvider):
                 return "text-embedding-004"
         return settings.EMBEDDING_MODEL
 
-    def _openai_embedding(self, text: str) -> List[float]:
+    @property
+    def cache_namespace(self) -> Optional[str]:
+        return f"{self.provider}:{self._resolve_model()}"
+
+    def _openai_embeddings(self, texts: List[str]) -> List[Embedding]:
         if not settings.EMBEDDING_API_KEY:
             logger.warning("Missing EMBEDDING_API_KEY for OpenAI embeddings")
-            return []
+            return [[] for _ in texts]
         try:
-            from openai import OpenAI
-
-            client = OpenAI(api_key=settings.EMBEDDING_API_KEY, base_url=settings.EMBEDDING_BASE_URL)
-            response = client.embeddings.create(
+            response = self._openai_client().embeddings.create(
                 model=self._resolve_model(),
-                input=text,
+                input=texts,
             )
-            return response.data[0].embedding
+            return [item.embedding for item in sorted(response.data, key=lambda item: item.index)]
         except Exception as exc:
             logger.warning("OpenAI embedding failed: %s", exc)
-            return []
+            return [[] for _ in texts]
 
-    def _gemini_embedding(self, text: str) -> List[float]:
+    def _gemini_embeddings(self, texts: List[str]) -> List[Embedding]:
         if not settings.EMBEDDING_API_KEY:
             logger.warning("Missing EMBEDDING_API_KEY for Gemini embeddings")
-            return []
+            return [[] for _ in texts]
         try:
             import google.generativeai as genai
 
             genai.configure(api_key=settings.EMBEDDING_API_KEY)
             response = genai.embed_content(
                 model=self._resolve_model(),
-                content=text,
+                content=texts,
                 task_type="retrieval_query",
             )
-            return response.get("embedding", [])
+            return response.get("embedding") or [[] for _ in texts]
         except Exception as exc:
             logger.warning("Gemini embedding failed: %s", exc)
-            return []
+            return [[] for _ in texts]
 
-    def get_embedding(self, text: str) -> List[float]:
+    def get_embeddings(self, texts: List[str]) -> List[Embedding]:
+        if not texts:
+            return []
         if self.provider == "openai":
-            return self._openai_embedding(text)
+            return self._openai_embeddings(texts)
         if self.provider == "gemini":
-            return self._gemini_embedding(text)
+            return self._gemini_embeddings(texts)
         logger.warning("Unknown embedding provider '%s'", self.provider)
-        return []
-
+        return [[] for _ in texts]
 
 class NoopEmbeddingProvider(BaseEmbeddingProvider):
-    def get_embedding(self, text: str) -> List[float]:
-        return []
+    def get_embeddings(self, texts: List[str]) -> List[Embedding]:
+        return [[] for _ in texts]
 
 
 class EmbeddingFactory:
     @staticmethod
     def create() -> BaseEmbeddingProvider:
-        provider = (settings.EMBEDDING_PROVIDER or "local").lower()
+        """Return the process-wide provider for the current embedding settings."""
+        key_fingerprint = hashlib.blake2b(
+            (settings.EMBEDDING_API_KEY or "").encode("utf-8"), digest_size=8
+        ).hexdigest()
+        return EmbeddingFactory._create(
+            (settings.EMBEDDING_PROVIDER or "local").lower(),
+            settings.EMBEDDING_MODEL,
+            key_fingerprint,
+        )
+
+    @staticmethod
+    @lru_cache(maxsize=8)
+    def _create(provider: str, model: str, key_fingerprint: str) -> BaseEmbeddingProvider:
+        # model and key_fingerprint only key the cache; providers read settings.
         if provider == "local":
             return LocalEmbeddingProvider()
+        if provider == "onnx":
+            return OnnxEmbeddingProvider()
         if provider in {"openai", "gemini"}:
             return CloudEmbeddingProvider(provider)
         if provider == "cloud":
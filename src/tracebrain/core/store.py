@@ -5,21 +5,25 @@ This module provides a flexible storage system for agent execution traces,
 supporting both SQLite (for development) and PostgreSQL (for production).
 """
 
+from collections import defaultdict, deque
 from contextlib import contextmanager
 from datetime import datetime, timedelta
-from typing import Dict, Any, Optional, List, Iterator, Union
+from typing import Dict, Any, Optional, List, Iterator, Sequence, Tuple, Union
 import logging
 import re
 import json
+import threading
 
 import sqlparse
-from sqlalchemy import create_engine, event, func, cast, text, Integer, Float, case
-from sqlalchemy.dialects.postgresql import JSONB
+from cachetools import LRUCache
+from sqlalchemy import create_engine, event, func, cast, inspect, literal, text, select, insert, update, delete, and_, or_, Integer, Float, case
+from sqlalchemy.dialects.postgresql import JSONB, JSONPATH
 from sqlalchemy.exc import IntegrityError, ProgrammingError, TimeoutError
-from sqlalchemy.orm import sessionmaker, Session, selectinload
+from sqlalchemy.orm import sessionmaker, Session, load_only, selectinload
+from sqlalchemy.schema import CreateIndex
 
 from tracebrain.config import settings
-from tracebrain.core.services.embedding import EmbeddingFactory
+from tracebrain.core.services.embedding import Embedding, EmbeddingFactory
 from tracebrain.db.base import (
     Base,
     Trace,
@@ -30,10 +34,16 @@ from tracebrain.db.base import (
     CurriculumTask,
     History,
     AppSettings,
+    json_serializer,
+    json_deserializer,
 )
 
 logger = logging.getLogger(__name__)
 
+# Rendered chat lines kept per session for librarian prompts, and how many sessions to keep.
+_RENDERED_HISTORY_MAXLEN = 64
+_RENDERED_HISTORY_SESSIONS = 1024
+
 
 class BaseStorageBackend:
     """
@@ -58,6 +68,8 @@ class BaseStorageBackend:
             "echo": settings.LOG_LEVEL.lower() == "debug",
             "pool_pre_ping": True,
             "pool_recycle": settings.DB_POOL_RECYCLE,
+            "json_serializer": json_serializer,
+            "json_deserializer": json_deserializer,
         }
 
         if self.is_sqlite:
@@ -65,6 +77,7 @@ class BaseStorageBackend:
         else:
             engine_kwargs["pool_size"] = settings.DB_POOL_SIZE
             engine_kwargs["max_overflow"] = settings.DB_MAX_OVERFLOW
+            engine_kwargs["pool_timeout"] = settings.DB_POOL_TIMEOUT
 
         self.engine = create_engine(db_url, **engine_kwargs)
 
@@ -73,6 +86,8 @@ class BaseStorageBackend:
             def set_sqlite_pragma(dbapi_connection, connection_record):
                 cursor = dbapi_connection.cursor()
                 cursor.execute("PRAGMA foreign_keys=ON")
+                cursor.execute("PRAGMA journal_mode=WAL")
+                cursor.execute("PRAGMA synchronous=NORMAL")
                 cursor.close()
                 
         self.SessionLocal = sessionmaker(
@@ -84,6 +99,23 @@ class BaseStorageBackend:
 
         self.embedding_provider = EmbeddingFactory.create()
 
+        # Write-behind buffer for history views; drained by a background flusher.
+        self._history_queue: deque = deque(maxlen=settings.HISTORY_BUFFER_SIZE)
+        self._history_wakeup = threading.Event()
+        self._history_flush_lock = threading.Lock()
+        self._history_start_lock = threading.Lock()
+        self._history_flusher: Optional[threading.Thread] = None
+        self._settings_cache: Optional[tuple[datetime, Dict[str, Any]]] = None
+        # Bumped after every committed trace, span, feedback, evaluation or history
+        # write in this process; read-side caches include it in their keys.
+        self._write_generation = 0
+        self._write_generation_lock = threading.Lock()
+
+        # session_id -> (newest message id, last rendered "role: content" lines),
+        # kept for prompt building.
+        self._rendered_history: LRUCache = LRUCache(maxsize=_RENDERED_HISTORY_SESSIONS)
+        self._rendered_history_lock = threading.Lock()
+
         self._create_tables()
 
     def _create_tables(self) -> None:
@@ -92,8 +124,70 @@ class BaseStorageBackend:
             with self.engine.begin() as connection:
                 connection.execute(text("CREATE EXTENSION IF NOT EXISTS vector"))
         Base.metadata.create_all(bind=self.engine)
+        # create_all skips indexes of tables that already exist.
+        with self.engine.begin() as connection:
+            for index in Trace.__table__.indexes:
+                if index.name == "idx_trace_episode_created":
+                    connection.execute(CreateIndex(index, if_not_exists=True))
+        if not self.is_sqlite:
+            for index in Trace.__table__.indexes:
+                if index.name == "idx_trace_embedding_hnsw":
+                    index.create(bind=self.engine, checkfirst=True)
+            self._warn_outdated_gin_indexes()
+        self._warn_superseded_episode_index()
         logger.info("Database tables created/verified for %s", self.__class__.__name__)
 
+    def _warn_superseded_episode_index(self) -> None:
+        """Log how to drop the single-column episode index that idx_trace_episode_created covers.
+
+        Dropping takes a lock on the traces table, so it is left to the operator.
+        """
+        existing = {index["name"] for index in inspect(self.engine).get_indexes(Trace.__tablename__)}
+        if "idx_trace_episode_id" in existing:
+            statement = (
+                "DROP INDEX idx_trace_episode_id;"
+                if self.is_sqlite
+                else "DROP INDEX CONCURRENTLY idx_trace_episode_id;"
+            )
+            logger.warning(
+                "Index idx_trace_episode_id is superseded by idx_trace_episode_created; drop it with: %s",
+                statement,
+            )
+
+    def _warn_outdated_gin_indexes(self) -> None:
+        """Log how to rebuild JSONB GIN indexes created before jsonb_path_ops.
+
+        Rebuilding locks or scans large tables, so it is left to the operator.
+        """
+        with self.engine.connect() as connection:
+            rows = connection.execute(
+                text(
+                    "SELECT tablename, indexname FROM pg_indexes "
+                    "WHERE indexname IN ('idx_trace_attributes_gin', 'idx_trace_feedback_gin', "
+                    "'idx_trace_ai_eval_gin', 'idx_span_attributes_gin') "
+                    "AND indexdef NOT LIKE '%jsonb_path_ops%'"
+                )
+            ).all()
+        for table_name, index_name in rows:
+            table = Base.metadata.tables[table_name]
+            index = next(ix for ix in table.indexes if ix.name == index_name)
+            column = index.expressions[0].name
+            logger.warning(
+                "Index %s predates jsonb_path_ops; rebuild it with: DROP INDEX CONCURRENTLY %s; "
+                "CREATE INDEX CONCURRENTLY %s ON %s USING gin (%s jsonb_path_ops);",
+                index_name, index_name, index_name, table_name, column,
+            )
+
+    @property
+    def write_generation(self) -> int:
+        """Counter of committed data writes made through this store."""
+        return self._write_generation
+
+    def bump_write_generation(self) -> None:
+        """Record a committed write so caches keyed on write_generation miss."""
+        with self._write_generation_lock:
+            self._write_generation += 1
+
     def get_session(self) -> Session:
         """Get a new database session."""
         return self.SessionLocal()
@@ -111,13 +205,38 @@ class BaseStorageBackend:
         finally:
             session.close()
 
-    def add_trace_from_dict(self, trace_data: Dict[str, Any]) -> str:
+    def embed_traces(self, traces: List[Dict[str, Any]]) -> List[Embedding]:
+        """
+        Embed several trace dictionaries with one batched provider call.
+
+        The results line up with traces and can be passed to add_trace_from_dict
+        as embedding=; traces without embeddable text get an empty embedding.
+        """
+        texts = [
+            self._extract_embedding_text(
+                (trace_data.get("attributes") or {}).get("system_prompt"),
+                trace_data.get("spans") or [],
+            )
+            for trace_data in traces
+        ]
+        positions = [i for i, text in enumerate(texts) if text]
+        embeddings: List[Embedding] = [[] for _ in traces]
+        if positions:
+            batch = self.embedding_provider.get_embeddings([texts[i] for i in positions])
+            for i, embedding in zip(positions, batch):
+                embeddings[i] = embedding
+        return embeddings
+
+    def add_trace_from_dict(
+        self, trace_data: Dict[str, Any], embedding: Optional[Embedding] = None
+    ) -> str:
         """
         Add a trace to the database from a dictionary (parsed JSON).
 
         Args:
             trace_data (dict): A dictionary representing a complete trace,
                 conforming to the TraceBrain OTLP schema.
+            embedding: Precomputed embedding from embed_traces; computed here when None.
 
         Returns:
             str: The trace_id of the inserted trace.
@@ -137,8 +256,9 @@ class BaseStorageBackend:
         ai_evaluation = attributes.get("tracebrain.ai_evaluation")
 
         spans_data = trace_data.get("spans") or []
-        embedding_text = self._extract_embedding_text(system_prompt, spans_data)
-        embedding = self.embedding_provider.get_embedding(embedding_text) if embedding_text else []
+        if embedding is None:
+            embedding_text = self._extract_embedding_text(system_prompt, spans_data)
+            embedding = self.embedding_provider.get_embedding(embedding_text) if embedding_text else []
 
         status = TraceStatus.running
         if isinstance(status_value, str):
@@ -161,7 +281,7 @@ class BaseStorageBackend:
             created_at=datetime.utcnow(),
             status=status,
             priority=priority,
-            embedding=embedding or None,
+            embedding=embedding if len(embedding) else None,
             attributes=attributes,
             ai_evaluation=ai_evaluation,
         )
@@ -174,6 +294,7 @@ class BaseStorageBackend:
         try:
             session.add(trace)
             session.commit()
+            self.bump_write_generation()
             logger.info("Successfully added trace %s with %s spans", trace_id, len(trace.spans))
             return trace_id
         except IntegrityError:
@@ -198,7 +319,7 @@ class BaseStorageBackend:
                     existing.status = status
                 if priority != existing.priority:
                     existing.priority = priority
-                if embedding and not existing.embedding:
+                if len(embedding) and existing.embedding is None:
                     existing.embedding = embedding
                 if ai_evaluation and not existing.ai_evaluation:
                     existing.ai_evaluation = ai_evaluation
@@ -212,6 +333,7 @@ class BaseStorageBackend:
                     existing.spans.append(span)
 
                 session.commit()
+                self.bump_write_generation()
                 logger.info("Merged trace %s with %s new spans", trace_id, len(spans_data))
                 return trace_id
             raise
@@ -251,6 +373,7 @@ class BaseStorageBackend:
             )
             session.add(trace)
             session.commit()
+            self.bump_write_generation()
             logger.info("Initialized trace %s", trace_id)
             return trace_id
         except Exception:
@@ -357,12 +480,14 @@ class BaseStorageBackend:
         if self.is_sqlite or not text:
             return []
 
-        embedding = self.embedding_provider.get_embedding(text)
-        if not embedding:
+        embedding = self.embedding_provider.get_cached_embedding(text)
+        if len(embedding) == 0:
             return []
 
         session = self.get_session()
         try:
+            # Candidate list size for the HNSW scan; rows are rating-filtered afterwards.
+            session.execute(text(f"SET LOCAL hnsw.ef_search = {int(settings.VECTOR_EF_SEARCH)}"))
             rating_value = cast(
                 func.jsonb_extract_path_text(cast(Trace.feedback, JSONB), "rating"),
                 Integer,
@@ -514,17 +639,10 @@ class BaseStorageBackend:
                 end_time=end_time,
             )
 
-            if not self.is_sqlite:
-                q = q.order_by(Trace.created_at.desc()).offset(skip).limit(limit)
-                if include_spans:
-                    q = q.options(selectinload(Trace.spans))
-                return q.all()
-
-            q = q.order_by(Trace.created_at.desc())
+            q = q.order_by(Trace.created_at.desc()).offset(skip).limit(limit)
             if include_spans:
                 q = q.options(selectinload(Trace.spans))
-            traces = q.all()
-            return traces[skip: skip + limit]
+            return q.all()
         finally:
             session.close()
 
@@ -554,10 +672,7 @@ class BaseStorageBackend:
                 end_time=end_time,
             )
 
-            if not self.is_sqlite:
-                return int(q.count())
-
-            return len(q.all())
+            return int(q.count())
         finally:
             session.close()
 
@@ -668,12 +783,63 @@ class BaseStorageBackend:
         finally:
             session.close()
 
+    def get_rated_traces_for_episode(
+        self,
+        episode_id: str,
+        exclude_id: Optional[str] = None,
+        limit: int = 20,
+    ) -> List[Trace]:
+        """Get an episode's most recent traces that carry a feedback rating.
+
+        Only id, feedback and created_at are loaded. On PostgreSQL the rating
+        check is a jsonpath match served by the feedback GIN index.
+        """
+        session = self.get_session()
+        try:
+            q = (
+                session.query(Trace)
+                .options(load_only(Trace.id, Trace.feedback, Trace.created_at))
+                .filter(Trace.episode_id == episode_id)
+            )
+            if exclude_id:
+                q = q.filter(Trace.id != exclude_id)
+            if self.is_sqlite:
+                q = q.filter(func.json_extract(Trace.feedback, "$.rating").isnot(None))
+            else:
+                q = q.filter(
+                    Trace.feedback.op("@?")(cast(literal("$.rating ? (@ != null)"), JSONPATH))
+                )
+            return q.order_by(Trace.created_at.desc()).limit(limit).all()
+        finally:
+            session.close()
+
+    def get_traces_by_episode_ids(self, episode_ids: List[str]) -> Dict[str, List[Trace]]:
+        """Get traces for several episodes, grouped by episode ID (newest first)."""
+        if not episode_ids:
+            return {}
+        session = self.get_session()
+        try:
+            traces = (
+                session.query(Trace)
+                .options(selectinload(Trace.spans))
+                .filter(Trace.episode_id.in_(episode_ids))
+                .order_by(Trace.created_at.desc())
+                .all()
+            )
+            grouped: Dict[str, List[Trace]] = defaultdict(list)
+            for trace in traces:
+                grouped[trace.episode_id].append(trace)
+            return grouped
+        finally:
+            session.close()
+
     def execute_read_only_sql(self, query: str, row_limit: int = 100) -> Dict[str, Any]:
         """Execute a read-only SQL query with defense-in-depth controls."""
         try:
             parsed = sqlparse.parse(query)
             if not parsed or parsed[0].get_type() != "SELECT":
                 raise ValueError("Only SELECT statements are permitted.")
+            query = self._with_row_limit(parsed[0], row_limit)
         except Exception as e:
             return {"error": f"SQL Parsing Error: {str(e)}"}
 
@@ -683,12 +849,19 @@ class BaseStorageBackend:
                     session.execute(text("SET LOCAL statement_timeout = 5000;"))
                     session.execute(text("SET LOCAL TRANSACTION READ ONLY;"))
 
-                result = session.execute(text(query))
+                # Stream through a server-side cursor so only row_limit rows leave
+                # the database, however large the full result is.
+                result = session.execute(
+                    text(query).execution_options(
+                        stream_results=True, max_row_buffer=row_limit
+                    )
+                )
                 column_names = list(result.keys())
                 rows = [
                     dict(zip(column_names, row))
                     for row in result.fetchmany(row_limit)
                 ]
+                result.close()
                 return {"rows": rows, "count": len(rows)}
 
         except TimeoutError:
@@ -701,6 +874,19 @@ class BaseStorageBackend:
             logger.error("Unexpected error in execute_read_only_sql: %s", e, exc_info=True)
             return {"error": "An unexpected internal error occurred."}
 
+    @staticmethod
+    def _with_row_limit(statement: sqlparse.sql.Statement, row_limit: int) -> str:
+        """Append LIMIT row_limit to a SELECT with no top-level LIMIT, OFFSET or FETCH.
+
+        Lets the database stop after the rows that will actually be read instead
+        of producing (and sorting) the full result.
+        """
+        for token in statement.tokens:
+            if token.ttype is sqlparse.tokens.Keyword and token.normalized in ("LIMIT", "OFFSET", "FETCH"):
+                return str(statement)
+        sql = sqlparse.format(str(statement), strip_comments=True).strip().rstrip(";").rstrip()
+        return f"{sql} LIMIT {int(row_limit)}"
+
     def get_chat_history(self, session_id: str) -> List[Dict[str, Any]]:
         """Return all messages for a session ordered by created_at."""
         session = self.get_session()
@@ -708,25 +894,69 @@ class BaseStorageBackend:
             messages = (
                 session.query(ChatMessage)
                 .filter(ChatMessage.session_id == session_id)
-                .order_by(ChatMessage.created_at.asc())
+                .order_by(ChatMessage.created_at.asc(), ChatMessage.id.asc())
                 .all()
             )
-            results = []
-            for message in messages:
-                content = message.content
-                if not isinstance(content, dict):
-                    content = {"answer": str(content)}
-                results.append(
-                    {
-                        "role": message.role,
-                        "content": content,
-                        "created_at": message.created_at,
-                    }
-                )
-            return results
+            return [self._chat_message_to_dict(message) for message in messages]
         finally:
             session.close()
 
+    def get_rendered_history(self, session_id: str) -> str:
+        """Return the session's recent messages as "role: content" lines.
+
+        Lines are rendered once when saved. The cached lines are reused only
+        while the session's newest message id still matches the database, so
+        turns saved by another worker trigger a reload of the latest messages.
+        """
+        session = self.get_session()
+        try:
+            last_id = (
+                session.query(func.max(ChatMessage.id))
+                .filter(ChatMessage.session_id == session_id)
+                .scalar()
+            )
+            with self._rendered_history_lock:
+                cached = self._rendered_history.get(session_id)
+                if cached is not None and cached[0] == last_id:
+                    return "\n".join(cached[1])
+
+            rows = (
+                session.query(ChatMessage.id, ChatMessage.role, ChatMessage.content)
+                .filter(ChatMessage.session_id == session_id)
+                .order_by(ChatMessage.id.desc())
+                .limit(_RENDERED_HISTORY_MAXLEN)
+                .all()
+            )
+        finally:
+            session.close()
+
+        ring = deque(
+            (self._render_chat_line(role, content) for _, role, content in reversed(rows)),
+            maxlen=_RENDERED_HISTORY_MAXLEN,
+        )
+        last_id = rows[0][0] if rows else None
+        with self._rendered_history_lock:
+            self._rendered_history[session_id] = (last_id, ring)
+        return "\n".join(ring)
+
+    @staticmethod
+    def _render_chat_line(role: str, content: Any) -> str:
+        if not isinstance(content, dict):
+            content = {"answer": str(content)}
+        return f"{role}: {content}"
+
+    @staticmethod
+    def _chat_message_to_dict(message: ChatMessage) -> Dict[str, Any]:
+        content = message.content
+        if not isinstance(content, dict):
+            content = {"answer": str(content)}
+        return {
+            "id": message.id,
+            "role": message.role,
+            "content": content,
+            "created_at": message.created_at,
+        }
+
     def save_chat_message(
         self,
         session_id: str,
@@ -734,27 +964,47 @@ class BaseStorageBackend:
         content: Union[str, Dict[str, Any]],
     ) -> None:
         """Save a new chat message, creating the session if needed."""
+        self.save_chat_messages(session_id, [(role, content)])
+
+    def save_chat_messages(
+        self,
+        session_id: str,
+        messages: Sequence[Tuple[str, Union[str, Dict[str, Any]]]],
+    ) -> None:
+        """Save a turn's chat messages in one transaction, creating the session if needed.
+
+        Messages share a timestamp and keep their order through ascending ids.
+        """
+        if not messages:
+            return
         session = self.get_session()
         try:
-            chat_session = session.query(ChatSession).filter(ChatSession.id == session_id).first()
-            if not chat_session:
-                chat_session = ChatSession(id=session_id)
-                session.add(chat_session)
-
-            payload: Dict[str, Any]
-            if isinstance(content, dict):
-                payload = content
-            elif role == "user":
-                payload = {"answer": str(content)}
-            else:
-                payload = {"answer": str(content)}
+            if session.get(ChatSession, session_id) is None:
+                session.add(ChatSession(id=session_id))
+                session.flush()
+            previous_id = (
+                session.query(func.max(ChatMessage.id))
+                .filter(ChatMessage.session_id == session_id)
+                .scalar()
+            )
 
-            message = ChatMessage(
-                session_id=session_id,
-                role=role,
-                content=payload,
+            created_at = datetime.utcnow()
+            rows = [
+                {
+                    "session_id": session_id,
+                    "role": role,
+                    "content": content if isinstance(content, dict) else {"answer": str(content)},
+                    "created_at": created_at,
+                }
+                for role, content in messages
+            ]
+            session.execute(insert(ChatMessage), rows)
+            last_id, inserted = (
+                session.query(func.max(ChatMessage.id), func.count(ChatMessage.id))
+                .filter(ChatMessage.session_id == session_id)
+                .filter(ChatMessage.id > (previous_id or 0))
+                .one()
             )
-            session.add(message)
             session.commit()
         except Exception:
             session.rollback()
@@ -763,6 +1013,22 @@ class BaseStorageBackend:
         finally:
             session.close()
 
+        lines = [self._render_chat_line(row["role"], row["content"]) for row in rows]
+        with self._rendered_history_lock:
+            cached = self._rendered_history.get(session_id)
+            if previous_id is None:
+                cached = (None, deque(maxlen=_RENDERED_HISTORY_MAXLEN))
+            if cached is None:
+                # Loaded lazily by get_rendered_history.
+                return
+            if cached[0] != previous_id or inserted != len(rows):
+                # Another worker wrote to this session; reload on next use.
+                self._rendered_history.pop(session_id, None)
+                return
+            ring = cached[1]
+            ring.extend(lines)
+            self._rendered_history[session_id] = (last_id, ring)
+
     def count_traces(self) -> int:
         """Return total trace count."""
         session = self.get_session()
@@ -798,6 +1064,7 @@ class BaseStorageBackend:
                     session.query(History).filter(History.id.in_(episode_ids)).delete(synchronize_session=False)
                 q.delete(synchronize_session=False)
                 session.commit()
+                self.bump_write_generation()
             return int(deleted)
         except Exception:
             session.rollback()
@@ -820,6 +1087,7 @@ class BaseStorageBackend:
             else:
                 trace.attributes = {"tracebrain.trace.status": TraceStatus.completed.value}
             session.commit()
+            self.bump_write_generation()
             logger.info("Added feedback to trace %s", trace_id)
             return True
         except Exception:
@@ -831,12 +1099,29 @@ class BaseStorageBackend:
 
     def get_settings(self) -> Dict[str, Any]:
         """Return global application settings (singleton row)."""
+        return self.get_versioned_settings()[1]
+
+    def get_versioned_settings(self) -> Tuple[Optional[datetime], Dict[str, Any]]:
+        """Return (updated_at, config) for the settings row; updated_at is None if unset."""
         session = self.get_session()
         try:
-            settings_row = session.query(AppSettings).filter(AppSettings.id == 1).first()
-            if not settings_row or not isinstance(settings_row.config, dict):
-                return {}
-            return dict(settings_row.config)
+            # Compare the row version first so unchanged settings skip the JSON load.
+            version = (
+                session.query(AppSettings.updated_at)
+                .filter(AppSettings.id == 1)
+                .scalar()
+            )
+            if version is None:
+                self._settings_cache = None
+                return None, {}
+            cached = self._settings_cache
+            if cached is not None and cached[0] == version:
+                return version, dict(cached[1])
+            config = session.query(AppSettings.config).filter(AppSettings.id == 1).scalar()
+            if not isinstance(config, dict):
+                return version, {}
+            self._settings_cache = (version, dict(config))
+            return version, dict(config)
         finally:
             session.close()
 
@@ -853,9 +1138,12 @@ class BaseStorageBackend:
                 existing = settings_row.config if isinstance(settings_row.config, dict) else {}
                 settings_row.config = {**existing, **payload}
             session.commit()
-            return dict(settings_row.config or {})
+            config = dict(settings_row.config or {})
+            self._settings_cache = (settings_row.updated_at, config)
+            return dict(config)
         except Exception:
             session.rollback()
+            self._settings_cache = None
             logger.exception("Failed to update settings")
             raise
         finally:
@@ -874,6 +1162,7 @@ class BaseStorageBackend:
             else:
                 trace.attributes = {"tracebrain.ai_evaluation": dict(ai_evaluation)}
             session.commit()
+            self.bump_write_generation()
         except Exception:
             session.rollback()
             logger.exception("Failed to update AI evaluation")
@@ -881,6 +1170,38 @@ class BaseStorageBackend:
         finally:
             session.close()
 
+    def bulk_update_ai_evaluations(self, items: List[tuple[str, Dict[str, Any]]]) -> int:
+        """Update AI evaluation metadata for many traces in a single transaction."""
+        if not items:
+            return 0
+        session = self.get_session()
+        try:
+            evaluations = {trace_id: dict(ai_evaluation) for trace_id, ai_evaluation in items}
+            rows = (
+                session.query(Trace.id, Trace.attributes)
+                .filter(Trace.id.in_(list(evaluations)))
+                .all()
+            )
+            params = []
+            for trace_id, attributes in rows:
+                ai_evaluation = evaluations[trace_id]
+                merged = dict(attributes) if isinstance(attributes, dict) else {}
+                merged["tracebrain.ai_evaluation"] = ai_evaluation
+                params.append(
+                    {"id": trace_id, "ai_evaluation": ai_evaluation, "attributes": merged}
+                )
+            if params:
+                session.execute(update(Trace), params)
+            session.commit()
+            self.bump_write_generation()
+            return len(params)
+        except Exception:
+            session.rollback()
+            logger.exception("Failed to bulk update AI evaluations")
+            raise
+        finally:
+            session.close()
+
     def update_trace_status(self, trace_id: str, status: TraceStatus) -> None:
         """Update the status for a trace."""
         session = self.get_session()
@@ -893,6 +1214,7 @@ class BaseStorageBackend:
             if updated == 0:
                 raise ValueError(f"Trace with ID '{trace_id}' not found")
             session.commit()
+            self.bump_write_generation()
         except Exception:
             session.rollback()
             logger.exception("Failed to update trace status")
@@ -1020,38 +1342,142 @@ class BaseStorageBackend:
             session.close()
 
     def add_history(self, id: str, type: str) -> None:
-        """Add an entry for a trace/episode to users history."""
-        session = self.get_session()
-        try:
-            if type == "trace":
-                exists = session.query(Trace).filter(Trace.id == id).first()
-            elif type == "episode":
-                exists = session.query(Trace).filter(Trace.episode_id == id).first()
-            else:
-                return
+        """Record a trace/episode view in users history.
 
-            if not exists:
+        Written immediately with a single upsert unless HISTORY_WRITE_BEHIND is
+        enabled, in which case the entry is queued for the background flusher.
+        """
+        if type not in ("trace", "episode"):
+            return
+        if not settings.HISTORY_WRITE_BEHIND:
+            self._write_history_batch({id: (type, datetime.utcnow())})
+            return
+        self._history_queue.append((id, type, datetime.utcnow()))
+        self._ensure_history_flusher()
+        if len(self._history_queue) >= settings.HISTORY_FLUSH_BATCH_SIZE:
+            self._history_wakeup.set()
+
+    def add_history_batch(self, entries: List[tuple[str, str]]) -> int:
+        """Record several history entries at once with a single upsert; returns rows written."""
+        now = datetime.utcnow()
+        batch: Dict[str, tuple[str, datetime]] = {}
+        for entry_id, entry_type in entries:
+            if entry_type in ("trace", "episode"):
+                batch[entry_id] = (entry_type, now)
+        if not batch:
+            return 0
+        return self._write_history_batch(batch)
+
+    def _ensure_history_flusher(self) -> None:
+        if self._history_flusher is not None and self._history_flusher.is_alive():
+            return
+        with self._history_start_lock:
+            if self._history_flusher is not None and self._history_flusher.is_alive():
                 return
+            self._history_flusher = threading.Thread(
+                target=self._history_flush_loop,
+                name="tracebrain-history-flusher",
+                daemon=True,
+            )
+            self._history_flusher.start()
 
-            existing = session.query(History).filter(History.id == id).first()
-            
-            if existing:
-                existing.last_accessed = datetime.utcnow()
-            else:
-                history_entry = History(
-                    id=id,
-                    type=type,
-                    last_accessed=datetime.utcnow()
+    def _history_flush_loop(self) -> None:
+        interval = settings.HISTORY_FLUSH_INTERVAL_MS / 1000.0
+        while True:
+            self._history_wakeup.wait(interval)
+            self._history_wakeup.clear()
+            try:
+                self.flush_history()
+            except Exception:
+                logger.exception("Failed to flush history entries")
+
+    def flush_history(self) -> int:
+        """Persist queued history entries in batches and return how many were written."""
+        written = 0
+        with self._history_flush_lock:
+            while self._history_queue:
+                batch: Dict[str, tuple[str, datetime]] = {}
+                while self._history_queue and len(batch) < settings.HISTORY_FLUSH_BATCH_SIZE:
+                    entry_id, entry_type, accessed = self._history_queue.popleft()
+                    batch[entry_id] = (entry_type, accessed)
+                written += self._write_history_batch(batch)
+        return written
+
+    def _write_history_batch(self, batch: Dict[str, tuple[str, datetime]]) -> int:
+        """Upsert one batch of history entries, skipping unknown traces/episodes."""
+        trace_ids = [entry_id for entry_id, (entry_type, _) in batch.items() if entry_type == "trace"]
+        episode_ids = [entry_id for entry_id, (entry_type, _) in batch.items() if entry_type == "episode"]
+        session = self.get_session()
+        try:
+            known = set()
+            if trace_ids:
+                known.update(
+                    row[0] for row in session.query(Trace.id).filter(Trace.id.in_(trace_ids))
                 )
-                session.add(history_entry)
-            
+            if episode_ids:
+                known.update(
+                    row[0]
+                    for row in session.query(Trace.episode_id)
+                    .filter(Trace.episode_id.in_(episode_ids))
+                    .distinct()
+                )
+            if not known:
+                return 0
+
+            rows = [
+                {"id": entry_id, "type": batch[entry_id][0], "last_accessed": batch[entry_id][1]}
+                for entry_id in known
+            ]
+            dialect = self.engine.dialect.name
+            if dialect in ("postgresql", "sqlite"):
+                if dialect == "postgresql":
+                    from sqlalchemy.dialects.postgresql import insert as dialect_insert
+                else:
+                    from sqlalchemy.dialects.sqlite import insert as dialect_insert
+                stmt = dialect_insert(History).values(rows)
+                stmt = stmt.on_conflict_do_update(
+                    index_elements=[History.id],
+                    set_={
+                        "type": stmt.excluded.type,
+                        "last_accessed": stmt.excluded.last_accessed,
+                    },
+                    where=History.last_accessed < stmt.excluded.last_accessed,
+                )
+                session.execute(stmt)
+            else:
+                existing = {
+                    entry.id: entry
+                    for entry in session.query(History).filter(History.id.in_(list(known)))
+                }
+                for row in rows:
+                    if row["id"] in existing:
+                        existing[row["id"]].last_accessed = row["last_accessed"]
+                    else:
+                        session.add(History(**row))
+
             session.commit()
+            self.bump_write_generation()
+            return len(known)
         except Exception:
             session.rollback()
             raise
         finally:
             session.close()
 
+    def get_history_version(self, type_filter: str) -> tuple[Optional[datetime], int]:
+        """Return (latest access time, entry count) for a history type, used as a cheap version key."""
+        self.flush_history()
+        session = self.get_session()
+        try:
+            latest, total = (
+                session.query(func.max(History.last_accessed), func.count(History.id))
+                .filter(History.type == type_filter)
+                .one()
+            )
+            return latest, int(total or 0)
+        finally:
+            session.close()
+
     def get_history(
         self, 
         type_filter: str,
@@ -1060,27 +1486,176 @@ class BaseStorageBackend:
         query: Optional[str] = None,
     ) -> tuple[List[History], int]:
         """Return trace/episode entries within history."""
+        self.flush_history()
         session = self.get_session()
         try:
-            q = session.query(History).filter(History.type == type_filter)
+            q = session.query(History, func.count().over().label("total")).filter(
+                History.type == type_filter
+            )
             
             if query:
                 q = q.filter(History.id.ilike(f"%{query}%"))
             
-            total = q.count()
-            items = q.order_by(History.last_accessed.desc()).limit(limit).offset(offset).all()
-            
-            return items, total
+            rows = q.order_by(History.last_accessed.desc()).limit(limit).offset(offset).all()
+            if rows:
+                return [row[0] for row in rows], int(rows[0][1])
+            # Page past the end: the window count is unavailable without rows.
+            return [], q.with_entities(func.count(History.id)).scalar() or 0
+        finally:
+            session.close()
+
+    @staticmethod
+    def _history_filters(type_filter: str, query: Optional[str]) -> List[Any]:
+        filters = [History.type == type_filter]
+        if query:
+            filters.append(History.id.ilike(f"%{query}%"))
+        return filters
+
+    @staticmethod
+    def _history_page_columns(
+        filters: List[Any],
+        cursor: Optional[tuple[datetime, str]],
+    ) -> tuple[List[Any], Any, Any]:
+        """Return (page filters, remaining column, total column) for offset or keyset paging.
+
+        ``remaining`` counts rows from the start of the page; ``total`` counts all
+        matching history entries regardless of the cursor.
+        """
+        if cursor is None:
+            remaining = func.count().over()
+            return list(filters), remaining, remaining
+        accessed, entry_id = cursor
+        page_filters = list(filters) + [
+            or_(
+                History.last_accessed < accessed,
+                and_(History.last_accessed == accessed, History.id < entry_id),
+            )
+        ]
+        total = select(func.count(History.id)).where(*filters).scalar_subquery()
+        return page_filters, func.count().over(), total
+
+    def get_history_traces(
+        self,
+        limit: int = 10,
+        offset: int = 0,
+        query: Optional[str] = None,
+        cursor: Optional[tuple[datetime, str]] = None,
+    ) -> tuple[List[Trace], int, Optional[tuple[datetime, str]]]:
+        """Return traces from history, most recently accessed first, with their spans.
+
+        Pages by ``offset`` or, when given, by the keyset ``cursor``
+        ``(last_accessed, id)``. Returns ``(traces, total, next_cursor)`` where
+        ``next_cursor`` is None on the last page.
+        """
+        self.flush_history()
+        session = self.get_session()
+        try:
+            filters = self._history_filters("trace", query)
+            page_filters, remaining, total = self._history_page_columns(filters, cursor)
+            q = (
+                session.query(
+                    Trace,
+                    History.last_accessed,
+                    remaining.label("remaining"),
+                    total.label("total"),
+                )
+                .join(History, History.id == Trace.id)
+                .filter(*page_filters)
+                .options(selectinload(Trace.spans))
+                .order_by(History.last_accessed.desc(), History.id.desc())
+                .limit(limit)
+            )
+            if cursor is None:
+                q = q.offset(offset)
+
+            rows = q.all()
+            if not rows:
+                count = session.query(func.count(History.id)).filter(*filters).scalar()
+                return [], int(count or 0), None
+
+            consumed = len(rows) if cursor is not None else offset + len(rows)
+            next_cursor = None
+            if consumed < int(rows[0][2]):
+                next_cursor = (rows[-1][1], rows[-1][0].id)
+            return [row[0] for row in rows], int(rows[0][3]), next_cursor
+        finally:
+            session.close()
+
+    def get_episode_history_hydrated(
+        self,
+        limit: int = 10,
+        offset: int = 0,
+        query: Optional[str] = None,
+        cursor: Optional[tuple[datetime, str]] = None,
+    ) -> tuple[List[tuple[str, List[Trace]]], int, Optional[tuple[datetime, str]]]:
+        """Return a page of episode history with each episode's traces, in one query.
+
+        Paging follows :meth:`get_history_traces`.
+        """
+        self.flush_history()
+        session = self.get_session()
+        try:
+            filters = self._history_filters("episode", query)
+            page_filters, remaining, total = self._history_page_columns(filters, cursor)
+            page_query = (
+                session.query(
+                    History.id.label("episode_id"),
+                    History.last_accessed.label("last_accessed"),
+                    remaining.label("remaining"),
+                    total.label("total"),
+                )
+                .filter(*page_filters)
+                .order_by(History.last_accessed.desc(), History.id.desc())
+                .limit(limit)
+            )
+            if cursor is None:
+                page_query = page_query.offset(offset)
+            page = page_query.subquery()
+
+            rows = (
+                session.query(page.c.episode_id, page.c.last_accessed, page.c.remaining, page.c.total, Trace)
+                .select_from(page)
+                .outerjoin(Trace, Trace.episode_id == page.c.episode_id)
+                .options(selectinload(Trace.spans))
+                .order_by(
+                    page.c.last_accessed.desc(),
+                    page.c.episode_id.desc(),
+                    Trace.created_at.desc(),
+                )
+                .all()
+            )
+            if not rows:
+                count = session.query(func.count(History.id)).filter(*filters).scalar()
+                return [], int(count or 0), None
+
+            grouped: Dict[str, List[Trace]] = {}
+            last_key = None
+            for episode_id, last_accessed, _, _, trace in rows:
+                traces = grouped.setdefault(episode_id, [])
+                if trace is not None:
+                    traces.append(trace)
+                last_key = (last_accessed, episode_id)
+
+            consumed = len(grouped) if cursor is not None else offset + len(grouped)
+            next_cursor = last_key if consumed < int(rows[0][2]) else None
+            return list(grouped.items()), int(rows[0][3]), next_cursor
         finally:
             session.close()
 
     def clear_history(self) -> int:
         """Empty the complete trace/episode entries history."""
+        with self._history_flush_lock:
+            self._history_queue.clear()
         session = self.get_session()
         try:
-            count = session.query(History).delete()
+            result = session.execute(delete(History))
             session.commit()
-            return count
+            self.bump_write_generation()
+            return int(result.rowcount or 0)
+        except Exception:
+            session.rollback()
+            logger.exception("Failed to clear history")
+            raise
         finally:
             session.close()
 
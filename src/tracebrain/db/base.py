@@ -7,8 +7,9 @@ conforming to the TraceBrain Standard OTLP Trace Schema.
 
 from datetime import datetime
 from enum import Enum
+import orjson
 from sqlalchemy import (
-    Column, String, Integer, DateTime, ForeignKey, Index, Text, UniqueConstraint, Enum as SAEnum
+    Column, String, Integer, DateTime, ForeignKey, Index, Text, UniqueConstraint, Enum as SAEnum, text
 )
 from sqlalchemy.dialects.postgresql import JSONB
 from sqlalchemy.orm import declarative_base, relationship
@@ -19,6 +20,18 @@ from pgvector.sqlalchemy import Vector
 Base = declarative_base()
 
 
+def json_serializer(value) -> str:
+    """Encode JSON/JSONB column values with orjson (engine ``json_serializer``)."""
+    return orjson.dumps(
+        value, default=str, option=orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY
+    ).decode("utf-8")
+
+
+def json_deserializer(value):
+    """Decode JSON/JSONB column values with orjson (engine ``json_deserializer``)."""
+    return orjson.loads(value)
+
+
 class JSONBCompat(TypeDecorator):
     """
     JSON type that uses JSONB for PostgreSQL and JSON for other databases.
@@ -142,10 +155,36 @@ class Trace(Base):
 
     __table_args__ = (
         Index("idx_trace_created_at", "created_at"),
-        Index("idx_trace_episode_id", "episode_id"),
-        Index("idx_trace_attributes_gin", "attributes", postgresql_using="gin"),
-        Index("idx_trace_feedback_gin", "feedback", postgresql_using="gin"),
-        Index("idx_trace_ai_eval_gin", "ai_evaluation", postgresql_using="gin"),
+        # Serves episode lookups and their newest-first ordering without a sort.
+        Index("idx_trace_episode_created", "episode_id", text("created_at DESC")),
+        # jsonb_path_ops GIN indexes serve containment (@>) and jsonpath (@?, @@)
+        # filters such as feedback @? '$.rating'; ->> comparisons are not indexed.
+        Index(
+            "idx_trace_attributes_gin",
+            "attributes",
+            postgresql_using="gin",
+            postgresql_ops={"attributes": "jsonb_path_ops"},
+        ),
+        Index(
+            "idx_trace_feedback_gin",
+            "feedback",
+            postgresql_using="gin",
+            postgresql_ops={"feedback": "jsonb_path_ops"},
+        ),
+        Index(
+            "idx_trace_ai_eval_gin",
+            "ai_evaluation",
+            postgresql_using="gin",
+            postgresql_ops={"ai_evaluation": "jsonb_path_ops"},
+        ),
+        # Approximate nearest-neighbour index for cosine similarity search (pgvector >= 0.5).
+        Index(
+            "idx_trace_embedding_hnsw",
+            "embedding",
+            postgresql_using="hnsw",
+            postgresql_with={"m": 16, "ef_construction": 64},
+            postgresql_ops={"embedding": "vector_cosine_ops"},
+        ).ddl_if(dialect="postgresql"),
     )
     
     def __repr__(self):
@@ -216,7 +255,12 @@ class Span(Base):
         UniqueConstraint("trace_id", "span_id", name="uq_span_trace_spanid"),
         Index("idx_span_trace_parent", "trace_id", "parent_id"),
         Index("idx_span_trace_time", "trace_id", "start_time"),
-        Index("idx_span_attributes_gin", "attributes", postgresql_using="gin"),
+        Index(
+            "idx_span_attributes_gin",
+            "attributes",
+            postgresql_using="gin",
+            postgresql_ops={"attributes": "jsonb_path_ops"},
+        ),
     )
     
     def __repr__(self):
@@ -32,7 +32,7 @@ from sqlalchemy import create_engine
 from sqlalchemy.orm import sessionmaker, Session
 
 from ..config import settings
-from .base import Base
+from .base import Base, json_serializer, json_deserializer
 
 
 # Global variables for engine and session maker
@@ -52,19 +52,21 @@ def get_engine():
     """
     global _engine
     if _engine is None:
-        connect_args = {}
+        engine_kwargs = {
+            "echo": settings.LOG_LEVEL.lower() == "debug",
+            "pool_pre_ping": True,
+            "pool_recycle": settings.DB_POOL_RECYCLE,
+            "json_serializer": json_serializer,
+            "json_deserializer": json_deserializer,
+        }
         if settings.is_sqlite:
-            connect_args = {"check_same_thread": False}
-
-        _engine = create_engine(
-            settings.DATABASE_URL,
-            echo=(settings.LOG_LEVEL.lower() == "debug"),
-            pool_pre_ping=True,
-            pool_recycle=settings.DB_POOL_RECYCLE,
-            pool_size=settings.DB_POOL_SIZE,
-            max_overflow=settings.DB_MAX_OVERFLOW,
-            connect_args=connect_args
-        )
+            engine_kwargs["connect_args"] = {"check_same_thread": False}
+        else:
+            engine_kwargs["pool_size"] = settings.DB_POOL_SIZE
+            engine_kwargs["max_overflow"] = settings.DB_MAX_OVERFLOW
+            engine_kwargs["pool_timeout"] = settings.DB_POOL_TIMEOUT
+
+        _engine = create_engine(settings.DATABASE_URL, **engine_kwargs)
     return _engine
 
 
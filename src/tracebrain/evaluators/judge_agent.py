@@ -5,12 +5,22 @@ from __future__ import annotations
 import json
 import logging
 import re
-from typing import Optional
+from typing import Any, Optional
+
+import orjson
 
 from tracebrain.core.llm_providers import ProviderError, select_provider
 
 logger = logging.getLogger(__name__)
 
+_FENCE_RE = re.compile(r"^```(json)?", re.IGNORECASE)
+_JSON_OBJ_RE = re.compile(r"\{.*\}", re.DOTALL)
+
+
+def _dumps(value: Any) -> str:
+    """Serialize a span or feedback value for the judge prompt."""
+    return orjson.dumps(value, default=str, option=orjson.OPT_NON_STR_KEYS).decode()
+
 
 class AIJudge:
     """Evaluate traces using a judge LLM with prior episode feedback."""
@@ -43,9 +53,14 @@ class AIJudge:
             action = attrs.get("tracebrain.llm.tool_code")
             observation = attrs.get("tracebrain.tool.output")
 
+            # Truncate before decoding so large outputs are never fully stringified.
             if isinstance(observation, (dict, list)):
-                observation = json.dumps(observation)
-            if observation:
+                observation = orjson.dumps(
+                    observation, default=str, option=orjson.OPT_NON_STR_KEYS
+                )[:500].decode(errors="ignore")
+            elif isinstance(observation, str):
+                observation = observation[:500]
+            elif observation:
                 observation = str(observation)[:500]
 
             lines.append(
@@ -63,31 +78,20 @@ class AIJudge:
         if not episode_id:
             return ""
 
-        traces = self.store.get_traces_by_episode_id(episode_id)
-        try:
-            traces = sorted(traces, key=lambda item: item.created_at, reverse=True)
-        except Exception:
-            pass
+        traces = self.store.get_rated_traces_for_episode(episode_id, exclude_id=current_trace_id)
 
         examples = []
         for trace in traces:
-            if trace.id == current_trace_id:
-                continue
-            if not trace.feedback:
-                continue
-
             rating = trace.feedback.get("rating")
             comment = trace.feedback.get("comment")
             tags = trace.feedback.get("tags")
             metadata = trace.feedback.get("metadata")
-            if rating is None:
-                continue
 
-            reason = comment if isinstance(comment, str) else json.dumps(comment) if comment else "No comment"
+            reason = comment if isinstance(comment, str) else _dumps(comment) if comment else "No comment"
             tag_text = ", ".join(tags) if isinstance(tags, list) and tags else "None"
             meta_text = ""
             if metadata:
-                meta_text = json.dumps(metadata) if not isinstance(metadata, str) else metadata
+                meta_text = _dumps(metadata) if not isinstance(metadata, str) else metadata
 
             examples.append(
                 "Trace "
@@ -109,14 +113,14 @@ class AIJudge:
 
         cleaned = text.strip()
         if cleaned.startswith("```"):
-            cleaned = re.sub(r"^```(json)?", "", cleaned, flags=re.IGNORECASE).strip()
+            cleaned = _FENCE_RE.sub("", cleaned).strip()
             if cleaned.endswith("```"):
                 cleaned = cleaned[:-3].strip()
 
         try:
             return json.loads(cleaned)
         except json.JSONDecodeError:
-            match = re.search(r"\{.*\}", cleaned, flags=re.DOTALL)
+            match = _JSON_OBJ_RE.search(cleaned)
             if not match:
                 raise
             return json.loads(match.group(0))
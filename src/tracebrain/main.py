@@ -89,6 +89,10 @@ async def lifespan(app: FastAPI):
         logger.error(f"Database initialization failed: {e}")
         raise
     
+    # Size the worker pool that async endpoints use for blocking store calls
+    import anyio.to_thread
+    anyio.to_thread.current_default_thread_limiter().total_tokens = settings.THREADPOOL_MAX_WORKERS
+
     # Check static directory
     package_dir = Path(__file__).parent
     static_dir = package_dir / settings.STATIC_DIR
@@ -112,6 +116,13 @@ async def lifespan(app: FastAPI):
     logger.info("TraceBrain Tracing API - Shutting Down")
     logger.info("=" * 70)
     
+    # Persist any buffered history entries before the connections go away
+    try:
+        from .api.v1.endpoints import store
+        store.flush_history()
+    except Exception as e:
+        logger.error(f"Error flushing history entries: {e}")
+
     # Close database connections
     if app_state["db_engine"] is not None:
         logger.info("Closing database connections...")
@@ -0,0 +1,10 @@
+"""Shared test setup."""
+
+import os
+import tempfile
+
+# The API module creates its store at import time; keep it out of the working tree.
+os.environ.setdefault(
+    "DATABASE_URL",
+    f"sqlite:///{os.path.join(tempfile.mkdtemp(prefix='tracebrain-tests-'), 'traces.db')}",
+)
@@ -0,0 +1,37 @@
+"""Tests for the rendered chat history kept by the store for librarian prompts."""
+
+from tracebrain.core.store import TraceStore
+
+
+def _stores(tmp_path):
+    url = f"sqlite:///{tmp_path / 'traces.db'}"
+    return TraceStore(backend="sqlite", db_url=url), TraceStore(backend="sqlite", db_url=url)
+
+
+def test_rendered_history_follows_own_saves(tmp_path):
+    store, _ = _stores(tmp_path)
+
+    store.save_chat_messages("s", [("user", "hi"), ("assistant", {"answer": "hello"})])
+    store.save_chat_messages("s", [("user", "again")])
+
+    assert store.get_rendered_history("s").splitlines() == [
+        "user: {'answer': 'hi'}",
+        "assistant: {'answer': 'hello'}",
+        "user: {'answer': 'again'}",
+    ]
+
+
+def test_rendered_history_picks_up_turns_saved_by_another_worker(tmp_path):
+    worker_a, worker_b = _stores(tmp_path)
+    worker_a.save_chat_messages("s", [("user", "first")])
+    assert worker_a.get_rendered_history("s") == "user: {'answer': 'first'}"
+
+    worker_b.save_chat_messages("s", [("user", "second")])
+    assert worker_a.get_rendered_history("s").splitlines() == [
+        "user: {'answer': 'first'}",
+        "user: {'answer': 'second'}",
+    ]
+
+    worker_a.save_chat_messages("s", [("user", "third")])
+    assert worker_a.get_rendered_history("s").splitlines()[-1] == "user: {'answer': 'third'}"
+    assert len(worker_a.get_rendered_history("s").splitlines()) == 3
@@ -0,0 +1,70 @@
+"""Tests for streaming curriculum generation."""
+
+from tracebrain.core.curator import CurriculumCurator
+from tracebrain.core.store import TraceStore
+from tracebrain.db.base import CurriculumTask
+
+
+def _task_count(store):
+    session = store.get_session()
+    try:
+        return session.query(CurriculumTask).count()
+    finally:
+        session.close()
+
+
+class _StreamingProvider:
+    def __init__(self, chunks, on_chunk=None):
+        self.chunks = chunks
+        self.on_chunk = on_chunk
+
+    def start_chat(self, system_prompt, tools):
+        return {}
+
+    def stream_user_message(self, session, content):
+        for chunk in self.chunks:
+            if self.on_chunk:
+                self.on_chunk()
+            yield chunk
+
+
+def _curator(tmp_path, monkeypatch, provider):
+    store = TraceStore(backend="sqlite", db_url=f"sqlite:///{tmp_path / 'traces.db'}")
+    curator = CurriculumCurator(store)
+    curator._provider = provider
+    curator._provider_initialized = True
+    monkeypatch.setattr(curator, "find_failed_traces", lambda limit, error_types: [object()])
+    monkeypatch.setattr(curator, "_summarize_traces", lambda traces: "")
+    return store, curator
+
+
+def test_streamed_tasks_are_saved_once_the_reply_ends(tmp_path, monkeypatch):
+    counts = []
+    provider = _StreamingProvider(
+        [
+            '[{"task": "a", "reasoning": "r", "priority": "high"},',
+            ' {"task": "b", "reasoning": "r"}]',
+        ],
+        on_chunk=lambda: counts.append(_task_count(store)),
+    )
+    store, curator = _curator(tmp_path, monkeypatch, provider)
+
+    assert curator.generate_curriculum(limit=2) == 2
+    assert counts == [0, 0]
+    assert _task_count(store) == 2
+
+
+def test_fenced_reply_with_preamble_is_parsed(tmp_path, monkeypatch):
+    provider = _StreamingProvider(['Here you go:\n```json\n[{"task": "a", "reasoning": "r"}]\n```'])
+    store, curator = _curator(tmp_path, monkeypatch, provider)
+
+    assert curator.generate_curriculum(limit=1) == 1
+    assert _task_count(store) == 1
+
+
+def test_duplicate_streamed_tasks_are_saved_once(tmp_path, monkeypatch):
+    provider = _StreamingProvider(['[{"task": "a", "reasoning": "r"}, {"task": "a", "reasoning": "r"}]'])
+    store, curator = _curator(tmp_path, monkeypatch, provider)
+
+    assert curator.generate_curriculum(limit=2) == 1
+    assert _task_count(store) == 1
@@ -0,0 +1,27 @@
+"""Tests for normalizing librarian sources in the natural-language query endpoint."""
+
+import pytest
+
+from tracebrain.api.v1.endpoints import _normalize_sources
+
+
+def test_none_stays_none():
+    assert _normalize_sources(None) is None
+
+
+@pytest.mark.parametrize("scalar, expected", [("abc", ["abc"]), (42, ["42"])])
+def test_scalar_becomes_single_item_list(scalar, expected):
+    assert _normalize_sources(scalar) == expected
+
+
+def test_list_of_strings_is_kept_as_is():
+    assert _normalize_sources(["a", "", "b"]) == ["a", "", "b"]
+
+
+def test_dicts_use_id_then_trace_id_and_skip_empty_values():
+    sources = [{"id": "a"}, {"trace_id": "b"}, {"id": 7}, {"id": ""}, {"other": "x"}]
+    assert _normalize_sources(sources) == ["a", "b", "7"]
+
+
+def test_other_list_items_are_ignored():
+    assert _normalize_sources(["a", 1, None, ["b"], {"id": "c"}]) == ["a", "c"]
@@ -0,0 +1,33 @@
+"""Tests for conditional GETs on the history endpoint."""
+
+from fastapi.testclient import TestClient
+
+from tracebrain.api.v1.endpoints import store
+from tracebrain.main import app
+
+client = TestClient(app)
+TRACE_ID = "e" * 32
+
+
+def _get(etag=None):
+    headers = {"If-None-Match": etag} if etag else {}
+    return client.get("/api/v1/history", params={"type": "trace"}, headers=headers)
+
+
+def test_history_get_returns_304_until_a_listed_trace_changes():
+    store.init_trace(TRACE_ID)
+    client.post("/api/v1/history", json={"id": TRACE_ID, "type": "trace"})
+
+    first = _get()
+    assert first.status_code == 200
+    etag = first.headers["etag"]
+    assert _get(etag).status_code == 304
+
+    store.add_feedback(TRACE_ID, {"rating": 4})
+    changed = _get(etag)
+    assert changed.status_code == 200
+    assert changed.headers["etag"] != etag
+
+
+def test_history_get_rejects_unknown_types():
+    assert client.get("/api/v1/history", params={"type": "span"}).status_code == 400
@@ -0,0 +1,93 @@
+"""Tests for when the librarian tries a single SQL query before the tool planner."""
+
+import json
+
+import pytest
+
+from tracebrain.core import librarian as librarian_module
+from tracebrain.core.librarian import LibrarianAgent
+
+
+class _ScriptedProvider:
+    """Provider stub that replays canned replies and records each chat."""
+
+    name = "stub"
+    supports_tools = True
+
+    def __init__(self, replies):
+        self.replies = list(replies)
+        self.chats = []
+
+    def start_chat(self, system_prompt, tools, cache_key=None):
+        self.chats.append(list(tools))
+        return {}
+
+    def send_user_message(self, session, message):
+        return self.replies.pop(0)
+
+    def send_tool_result(self, session, tool_name, tool_result, tool_call_id):
+        return self.replies.pop(0)
+
+    def extract_text(self, response):
+        return response if isinstance(response, str) else ""
+
+    def extract_tool_calls(self, response):
+        return response if isinstance(response, list) else []
+
+
+class _Store:
+    write_generation = 0
+
+    def __init__(self):
+        self.saved = []
+
+    def get_rendered_history(self, session_id):
+        return []
+
+    def save_chat_messages(self, session_id, messages):
+        self.saved.extend(messages)
+
+    def execute_read_only_sql(self, query, row_limit=100):
+        return {"count": 1, "rows": [{"n": 7}]}
+
+    def search_similar_experiences(self, query, min_rating=4, limit=3):
+        return []
+
+
+ANSWER = json.dumps({"answer": "There are 7 traces.", "suggestions": [], "sources": []})
+
+
+@pytest.fixture
+def use_provider(monkeypatch):
+    def install(provider):
+        monkeypatch.setattr(librarian_module, "LIBRARIAN_AVAILABLE", True)
+        monkeypatch.setattr(librarian_module, "get_provider", lambda model_override=None: provider)
+
+    return install
+
+
+def test_aggregate_question_is_answered_by_one_shot_sql(use_provider):
+    provider = _ScriptedProvider(
+        [json.dumps({"sql": "SELECT count(*) AS n FROM traces"}), ANSWER]
+    )
+    use_provider(provider)
+    store = _Store()
+
+    result = LibrarianAgent(store).query("How many traces failed?", "s1")
+
+    assert result["answer"] == "There are 7 traces."
+    assert provider.chats == [[]]
+    roles = [role for role, _ in store.saved]
+    assert roles == ["user", "tool", "assistant"]
+    assert store.saved[1][1].startswith("SQL: SELECT count(*) AS n FROM traces\nRESULT: ")
+
+
+def test_semantic_question_goes_straight_to_the_tool_planner(use_provider):
+    provider = _ScriptedProvider([ANSWER])
+    use_provider(provider)
+    store = _Store()
+
+    LibrarianAgent(store).query("Show traces similar to the login failure", "s2")
+
+    assert len(provider.chats) == 1
+    assert provider.chats[0], "tool planner should start with tool specs"
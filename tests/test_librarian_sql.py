@@ -0,0 +1,90 @@
+"""Tests for the librarian's SQL canonicalization and result caches."""
+
+import pytest
+
+from tracebrain.core.librarian import LibrarianAgent, _canonical_sql, _first_select_statement
+
+
+class _RecordingStore:
+    write_generation = 0
+
+    def __init__(self, response):
+        self.response = response
+        self.queries = []
+
+    def execute_read_only_sql(self, query, row_limit=100):
+        self.queries.append(query)
+        return self.response
+
+
+MALFORMED_SQL = "SELECT 'unterminated FROM traces"
+
+
+def test_canonical_sql_falls_back_on_untokenizable_input():
+    assert _canonical_sql(MALFORMED_SQL) == MALFORMED_SQL
+
+
+def test_first_select_statement_falls_back_on_untokenizable_input():
+    assert _first_select_statement(MALFORMED_SQL) == MALFORMED_SQL
+
+
+def test_first_select_statement_returns_the_original_statement_text():
+    sql = "DELETE FROM traces; SELECT id::text FROM traces WHERE status ILIKE 'ok%';"
+    assert _first_select_statement(sql) == "SELECT id::text FROM traces WHERE status ILIKE 'ok%';"
+
+
+def test_first_select_statement_skips_data_modifying_ctes():
+    sql = "WITH d AS (DELETE FROM traces RETURNING *) SELECT * FROM d; SELECT 1"
+    assert _first_select_statement(sql) == "SELECT 1"
+
+
+def test_run_sql_query_reports_malformed_sql_instead_of_raising():
+    store = _RecordingStore({"error": "syntax error"})
+    agent = LibrarianAgent(store)
+
+    assert agent.run_sql_query(MALFORMED_SQL) == "EXECUTION_FAILED: syntax error"
+    # Failures are not cached, so a retry reaches the store again.
+    assert agent.run_sql_query(MALFORMED_SQL) == "EXECUTION_FAILED: syntax error"
+    assert store.queries == [MALFORMED_SQL, MALFORMED_SQL]
+
+
+def test_run_sql_query_caches_by_canonical_statement():
+    store = _RecordingStore({"count": 1, "rows": [{"n": 1}]})
+    agent = LibrarianAgent(store)
+
+    first = agent.run_sql_query("select count(*) as n from traces")
+    second = agent.run_sql_query("SELECT   COUNT(*) AS n\nFROM traces;")
+
+    assert first == second == '[{"n":1}]'
+    assert len(store.queries) == 1
+
+
+def test_canonical_sql_with_sqlglot_handles_tokenizer_errors():
+    pytest.importorskip("sqlglot")
+    import sqlglot
+
+    with pytest.raises(sqlglot.errors.TokenError):
+        sqlglot.transpile(MALFORMED_SQL, read="postgres")
+    assert _canonical_sql(MALFORMED_SQL) == MALFORMED_SQL
+
+
+def test_run_sql_query_cache_misses_after_a_store_write():
+    store = _RecordingStore({"count": 1, "rows": [{"n": 1}]})
+    agent = LibrarianAgent(store)
+
+    agent.run_sql_query("SELECT count(*) AS n FROM traces")
+    store.write_generation += 1
+    agent.run_sql_query("SELECT count(*) AS n FROM traces")
+
+    assert len(store.queries) == 2
+
+
+def test_answer_cache_key_changes_after_a_store_write():
+    store = _RecordingStore({})
+    agent = LibrarianAgent(store)
+
+    before = agent._cache_key("history", "How many traces failed?", "model")
+    store.write_generation += 1
+    after = agent._cache_key("history", "How many traces failed?", "model")
+
+    assert before != after
@@ -0,0 +1,34 @@
+"""Tests for librarian history token budgeting."""
+
+import sys
+import types
+
+from tracebrain.core import librarian
+
+
+def _fake_tiktoken(monkeypatch, get_encoding):
+    monkeypatch.setitem(sys.modules, "tiktoken", types.SimpleNamespace(get_encoding=get_encoding))
+    librarian._get_token_encoder.cache_clear()
+
+
+def test_count_tokens_estimates_when_the_encoder_cannot_load(monkeypatch):
+    def get_encoding(name):
+        raise OSError("BPE download failed")
+
+    _fake_tiktoken(monkeypatch, get_encoding)
+    try:
+        assert librarian._count_tokens(["x" * 40]) == [11]
+    finally:
+        librarian._get_token_encoder.cache_clear()
+
+
+def test_count_tokens_estimates_when_encoding_fails(monkeypatch):
+    class _Encoder:
+        def encode_ordinary_batch(self, lines):
+            raise ValueError("bad input")
+
+    _fake_tiktoken(monkeypatch, lambda name: _Encoder())
+    try:
+        assert librarian._count_tokens(["x" * 40]) == [11]
+    finally:
+        librarian._get_token_encoder.cache_clear()
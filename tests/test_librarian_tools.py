@@ -0,0 +1,44 @@
+"""Tests for running a turn's tool calls."""
+
+from concurrent.futures import Future
+
+import pytest
+
+from tracebrain.core import librarian as librarian_module
+from tracebrain.core.librarian import LibrarianAgent
+
+
+class _Store:
+    write_generation = 0
+
+
+class _DeferredExecutor:
+    """Executor stub that runs only the first submitted call and leaves the rest queued."""
+
+    def __init__(self):
+        self.futures = []
+
+    def submit(self, fn, *args):
+        future = Future()
+        if not self.futures:
+            try:
+                future.set_result(fn(*args))
+            except Exception as exc:
+                future.set_exception(exc)
+        self.futures.append(future)
+        return future
+
+
+def test_queued_tool_calls_are_cancelled_after_a_failure(monkeypatch):
+    executor = _DeferredExecutor()
+    monkeypatch.setattr(librarian_module, "_get_tool_executor", lambda: executor)
+    agent = LibrarianAgent(_Store())
+
+    def run_tool(self, call):
+        raise RuntimeError(call["name"])
+
+    monkeypatch.setattr(LibrarianAgent, "_run_tool", run_tool)
+    with pytest.raises(RuntimeError, match="first"):
+        agent._run_tool_calls([{"name": "first"}, {"name": "second"}, {"name": "third"}])
+
+    assert [future.cancelled() for future in executor.futures] == [False, True, True]
@@ -0,0 +1,34 @@
+"""Tests for the row limit pushed into read-only SQL."""
+
+import pytest
+import sqlparse
+
+from tracebrain.core.store import BaseStorageBackend
+
+
+def _limited(query, row_limit=100):
+    return BaseStorageBackend._with_row_limit(sqlparse.parse(query)[0], row_limit)
+
+
+def test_appends_limit_when_missing():
+    assert _limited("SELECT id FROM traces ORDER BY created_at DESC;") == (
+        "SELECT id FROM traces ORDER BY created_at DESC LIMIT 100"
+    )
+
+
+@pytest.mark.parametrize(
+    "query",
+    [
+        "SELECT id FROM traces LIMIT 5",
+        "SELECT id FROM traces OFFSET 5",
+        "SELECT id FROM traces ORDER BY id FETCH FIRST 5 ROWS ONLY",
+        "SELECT id FROM traces OFFSET 2 ROWS FETCH NEXT 5 ROWS ONLY",
+    ],
+)
+def test_keeps_existing_row_limits(query):
+    assert _limited(query) == query
+
+
+def test_subquery_limit_does_not_count_as_top_level():
+    query = "SELECT * FROM (SELECT id FROM traces FETCH FIRST 5 ROWS ONLY) AS q"
+    assert _limited(query, 10) == f"{query} LIMIT 10"
@@ -0,0 +1,32 @@
+"""Tests for batching trace embeddings during ingestion."""
+
+from tracebrain.core.store import TraceStore
+
+
+class _CountingProvider:
+    def __init__(self):
+        self.batches = []
+
+    def get_embeddings(self, texts):
+        self.batches.append(list(texts))
+        return [[] for _ in texts]
+
+
+def _trace(trace_id, system_prompt=None):
+    return {"trace_id": trace_id, "attributes": {"system_prompt": system_prompt}, "spans": []}
+
+
+def test_embed_traces_uses_one_batch_and_skips_empty_texts(tmp_path):
+    store = TraceStore(backend="sqlite", db_url=f"sqlite:///{tmp_path / 'traces.db'}")
+    provider = _CountingProvider()
+    store.embedding_provider = provider
+
+    traces = [_trace("a" * 32, "first"), _trace("b" * 32), _trace("c" * 32, "third")]
+    embeddings = store.embed_traces(traces)
+
+    assert len(embeddings) == 3
+    assert provider.batches == [["System prompt: first", "System prompt: third"]]
+
+    for trace_data, embedding in zip(traces, embeddings):
+        store.add_trace_from_dict(trace_data, embedding=embedding)
+    assert len(provider.batches) == 1
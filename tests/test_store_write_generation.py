@@ -0,0 +1,23 @@
+"""Tests for the store write generation used to invalidate read caches."""
+
+from tracebrain.core.store import TraceStore
+
+
+def test_data_writes_bump_the_write_generation(tmp_path):
+    store = TraceStore(backend="sqlite", db_url=f"sqlite:///{tmp_path / 'traces.db'}")
+    before = store.write_generation
+
+    store.init_trace("a" * 32)
+    store.add_feedback("a" * 32, {"rating": 5})
+    store.add_history("a" * 32, "trace")
+
+    assert store.write_generation == before + 3
+
+
+def test_chat_messages_do_not_bump_the_write_generation(tmp_path):
+    store = TraceStore(backend="sqlite", db_url=f"sqlite:///{tmp_path / 'traces.db'}")
+    before = store.write_generation
+
+    store.save_chat_messages("s", [("user", "hi")])
+
+    assert store.write_generation == before
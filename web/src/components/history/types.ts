@@ -7,4 +7,5 @@ export interface HistoryList {
   total: number;
   limit: number;
   offset: number;
+  next_cursor?: string | null;
 }